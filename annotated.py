@@ -0,0 +1,125 @@
+from collections import namedtuple
+import os
+import numpy as np
+import pandas as pd
+
+# Canonical layout for annotated tweet frames
+SENT_COLS = ['sent_bear', 'sent_neut', 'sent_bull']
+CATEGORICAL_COLS = ['screen_name', 'source', 'price_move', 'model_pred', 'model_move']
+ID_COLS = ['id', 'conversationId', 'inReplyToId', 'quoteId']
+TICKER_COLS = ['matched_tickers', 'tickers']
+
+# Tweet -> ticker mapping in CSR form: tickers of row i are tickers[indices[offsets[i]:offsets[i + 1]]]
+TickerCSR = namedtuple('TickerCSR', ['offsets', 'indices', 'tickers'])
+
+
+def split_tickers(values):
+    """
+    Ticker lists from either comma-joined strings ('AAPL,MSFT') or stringified
+    Python lists ("['$TSLA', '$AAPL']"), upper-cased and without '$'.
+    """
+    cleaned = (pd.Series(values).fillna('').astype(str)
+               .str.replace(r"[\[\]'\"$\s]", '', regex=True).str.upper())
+    return cleaned.str.split(',').map(lambda items: [t for t in items if t])
+
+
+def ticker_csr(lists):
+    """Build a TickerCSR from one ticker list per row."""
+    lists = list(lists)
+    lengths = np.fromiter((len(x) for x in lists), dtype=np.int64, count=len(lists))
+    offsets = np.zeros(len(lists) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    flat = pd.Categorical([t for x in lists for t in x])
+    return TickerCSR(offsets, flat.codes.astype(np.int32), np.asarray(flat.categories, dtype=object))
+
+
+def take(csr, rows):
+    """The TickerCSR of a subset (or reordering) of rows, sharing the ticker names."""
+    rows = np.asarray(rows, dtype=np.int64)
+    lengths = np.diff(csr.offsets)[rows]
+    offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    source = np.repeat(csr.offsets[rows] - offsets[:-1], lengths) + np.arange(offsets[-1])
+    return TickerCSR(offsets, csr.indices[source], csr.tickers)
+
+
+def exploded(csr, ids=None):
+    """Tweet x ticker table: one row per (tweet row, ticker), with the tweet id when given."""
+    rows = np.repeat(np.arange(len(csr.offsets) - 1, dtype=np.int64), np.diff(csr.offsets))
+    out = pd.DataFrame({
+        'row': rows,
+        'ticker': pd.Categorical.from_codes(csr.indices, categories=csr.tickers),
+    })
+    if ids is not None:
+        out.insert(0, 'id', np.asarray(ids, dtype=np.int64)[rows])
+    return out
+
+
+def joined_tickers(csr):
+    """Comma-joined ticker string per row, for CSV output."""
+    names = csr.tickers[csr.indices]
+    return [','.join(names[csr.offsets[i]:csr.offsets[i + 1]]) for i in range(len(csr.offsets) - 1)]
+
+
+def compact(frame):
+    """
+    Apply the canonical dtypes and split the ticker column out into a TickerCSR.
+    Returns (frame without the ticker column, csr).
+    """
+    frame = frame.reset_index(drop=True)
+    for col in SENT_COLS:
+        if col in frame.columns:
+            frame[col] = frame[col].astype(np.float32)
+    for col in CATEGORICAL_COLS:
+        if col in frame.columns:
+            frame[col] = frame[col].astype('category')
+    for col in ID_COLS:
+        if col in frame.columns:
+            ids = frame[col]
+            if ids.dtype.kind not in 'iuf':
+                # Ids read as text are parsed exactly; going through float64 loses digits above 2^53
+                text = ids.astype('string').str.strip().str.replace(r'\.0*$', '', regex=True)
+                ids = text.where(text.str.fullmatch(r'[+-]?\d+'), None).astype('Int64')
+            frame[col] = ids.astype(np.int64) if ids.notna().all() else ids.round().astype('Int64')
+    ticker_col = next((c for c in TICKER_COLS if c in frame.columns), None)
+    if ticker_col is None:
+        return frame, ticker_csr([[]] * len(frame))
+    csr = ticker_csr(split_tickers(frame[ticker_col]))
+    return frame.drop(columns=ticker_col), csr
+
+
+def load_annotated(path):
+    """
+    Load an annotated tweet file in the canonical layout.
+    CSV files are converted on load; Parquet files written by write_annotated are
+    read back with their ticker table (<stem>.tickers.parquet).
+    """
+    if path.endswith('.parquet'):
+        frame, _ = compact(pd.read_parquet(path))
+        pairs = pd.read_parquet(_tickers_path(path)).sort_values('row', kind='stable')
+        offsets = np.zeros(len(frame) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs['row'].to_numpy(), minlength=len(frame)), out=offsets[1:])
+        codes = pd.Categorical(pairs['ticker'].astype(str))
+        return frame, TickerCSR(offsets, codes.codes.astype(np.int32), np.asarray(codes.categories, dtype=object))
+    return compact(pd.read_csv(path, dtype={col: str for col in ID_COLS}))
+
+
+def csv_frame(frame, csr, ticker_col='matched_tickers'):
+    """A canonical frame as it is written to CSV, with the tickers joined back into ticker_col."""
+    out = frame.copy()
+    out[ticker_col] = joined_tickers(csr)
+    return out
+
+
+def write_annotated(frame, csr, path, ticker_col='matched_tickers'):
+    """Write a canonical frame: Parquet plus an exploded ticker table, or CSV with comma-joined tickers."""
+    if path.endswith('.parquet'):
+        frame.to_parquet(path, index=False)
+        exploded(csr).to_parquet(_tickers_path(path), index=False)
+    else:
+        csv_frame(frame, csr, ticker_col).to_csv(path, index=False)
+
+
+def _tickers_path(path):
+    stem, _ = os.path.splitext(path)
+    return stem + '.tickers.parquet'
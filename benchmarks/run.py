@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pilot_study'))
+import synthetic
+
+ROOT = synthetic.ROOT
+RESULTS_DIR = os.path.join(ROOT, 'cache', 'benchmarks')
+DEFAULT_SIZES = [1_000, 100_000]
+
+# name -> (setup(n) returning the timed callable, largest size it runs at)
+BENCHMARKS = {}
+
+
+def bench(name, max_rows=None):
+    def register(setup):
+        BENCHMARKS[name] = (setup, max_rows)
+        return setup
+    return register
+
+
+@bench('match_single_pass')
+def match_single_pass(n):
+    from ticker_matcher import TickerMatcher
+    texts = synthetic.tweets(n)['text']
+    matcher = TickerMatcher.from_csv(os.path.join(ROOT, 'sp100_context.csv'))
+    return lambda: matcher.match_column(texts)
+
+
+# The original per-ticker loop is ~100x slower; 1M rows would take many minutes
+@bench('match_pattern_loop', max_rows=100_000)
+def match_pattern_loop(n):
+    from general_annotate import load_stock_patterns
+    texts = synthetic.tweets(n)['text'].tolist()
+    stocks = os.path.join(ROOT, 'sp100_context.csv')
+
+    def run():
+        patterns = load_stock_patterns(stocks)
+        return [','.join(t for t, pat in patterns if pat.search(x)) for x in texts]
+    return run
+
+
+@bench('score_fake_finbert')
+def score_fake_finbert(n):
+    from sentiment import score_texts
+    texts = synthetic.tweets(n)['text'].tolist()
+    tokenizer, model = synthetic.fake_finbert()
+    return lambda: score_texts(texts, tokenizer, model, batch_size=64)
+
+
+@bench('compute_car')
+def compute_car(n):
+    from event_study import compute_car
+    tweets = synthetic.tweets(n)
+    closes = synthetic.prices(synthetic.load_terms()[0])
+    returns = closes.pct_change()
+    market = returns.pop('SPY')
+    tickers = np.random.default_rng(0).choice(returns.columns, size=n)
+    return lambda: compute_car(returns, tweets['date'], tickers, windows=[(1, 3), (0, 1), (-1, 5)],
+                               market=market)
+
+
+@bench('dedup_minhash')
+def dedup_minhash(n):
+    from dedup import cluster_labels
+    texts = synthetic.tweets(n)['text']
+    return lambda: cluster_labels(texts)
+
+
+# 10k bootstrap and placebo resamples per sentiment bucket; events beyond 100k add nothing new
+@bench('car_tests', max_rows=100_000)
+def car_tests(n):
+    from car_stats import BUCKETS, event_tests
+    rng = np.random.default_rng(0)
+    car = rng.normal(0.001, 0.03, n)
+    pool = rng.normal(0, 0.03, 2_000)
+    buckets = rng.choice(BUCKETS, size=n)
+    return lambda: event_tests(car, car / 0.03, np.full(n, 18), buckets, pool)
+
+
+@bench('label_moves')
+def label_moves(n):
+    from eval import label_moves
+    tweets = synthetic.annotated(n)
+    closes = synthetic.prices(synthetic.load_terms()[0]).drop(columns='SPY')
+    return lambda: label_moves(tweets, closes)
+
+
+@bench('eps_grid')
+def eps_grid(n):
+    from eval_grid import eps_surface
+    rng = np.random.default_rng(0)
+    scores = rng.dirichlet([1.0, 2.0, 1.0], size=n)
+    y_true = rng.integers(-1, 3, size=n)
+    eps_grid = np.linspace(0, 1, 1001)
+    return lambda: eps_surface(scores, y_true, eps_grid)
+
+
+def _io_bench(n, fmt, mode):
+    frame = synthetic.annotated(n)
+    path = os.path.join(tempfile.mkdtemp(prefix='bench-io-'), f'annotated.{fmt}')
+    write = (lambda: frame.to_csv(path, index=False)) if fmt == 'csv' else (lambda: frame.to_parquet(path, index=False))
+    read = (lambda: pd.read_csv(path)) if fmt == 'csv' else (lambda: pd.read_parquet(path))
+    write()
+    return write if mode == 'write' else read
+
+
+for _fmt in ['csv', 'parquet']:
+    for _mode in ['write', 'read']:
+        bench(f'{_fmt}_{_mode}')(lambda n, fmt=_fmt, mode=_mode: _io_bench(n, fmt, mode))
+
+
+def time_call(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run(names, sizes, repeat=3):
+    """Time every selected benchmark at every size; setup (data generation) is not timed."""
+    results = []
+    for name in names:
+        setup, max_rows = BENCHMARKS[name]
+        for n in sizes:
+            entry = {'benchmark': name, 'rows': n}
+            if max_rows is not None and n > max_rows:
+                entry['skipped'] = f'above max_rows={max_rows}'
+            else:
+                try:
+                    fn = setup(n)
+                except ImportError as e:
+                    entry['skipped'] = f'missing dependency: {e.name}'
+                else:
+                    times = time_call(fn, repeat)
+                    entry.update(min_s=min(times), median_s=statistics.median(times), repeat=repeat,
+                                 rows_per_s=n / min(times))
+            results.append(entry)
+            if 'skipped' in entry:
+                print(f"{name:<20}{n:>10,}  skipped ({entry['skipped']})", flush=True)
+            else:
+                print(f"{name:<20}{n:>10,}  {entry['min_s']:>9.4f}s  {entry['rows_per_s']:>14,.0f} rows/s", flush=True)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(baseline_path, current_path, tolerance=0.10):
+    """Print per-benchmark speed ratios; returns the (benchmark, rows) pairs slower than tolerance allows."""
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['rows']): r for r in json.load(f)['results'] if 'min_s' in r}
+    with open(current_path) as f:
+        current = {(r['benchmark'], r['rows']): r for r in json.load(f)['results'] if 'min_s' in r}
+    regressions = []
+    print(f"{'benchmark':<20}{'rows':>10}  {'baseline':>10}  {'current':>10}  ratio")
+    for key in sorted(baseline.keys() & current.keys()):
+        ratio = current[key]['min_s'] / baseline[key]['min_s']
+        flag = ''
+        if ratio > 1 + tolerance:
+            flag = '  REGRESSION'
+            regressions.append(key)
+        print(f"{key[0]:<20}{key[1]:>10,}  {baseline[key]['min_s']:>9.4f}s  {current[key]['min_s']:>9.4f}s  "
+              f"{ratio:5.2f}x{flag}")
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time the hot paths on synthetic data (offline)')
+    parser.add_argument('benchmarks', nargs='*', help=f"Subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='Row counts, e.g. 1000 100000 1000000')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help=f'Results JSON (default: {RESULTS_DIR}/<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='Compare two result files instead of running')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed slowdown before flagging')
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, tolerance=args.tolerance) else 0)
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    commit = git_commit()
+    results = run(args.benchmarks or list(BENCHMARKS), args.sizes, args.repeat)
+    output = args.output or os.path.join(RESULTS_DIR, f'{commit}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({'commit': commit, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'python': platform.python_version(), 'machine': platform.machine(),
+                   'cpus': os.cpu_count(), 'results': results}, f, indent=1)
+    print(f"Saved {len(results)} results to {output}")
@@ -0,0 +1,55 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Commands that must not load a model, a network client or a plotting backend
+CHECKS = [
+    ['cli.py', '--help'],
+    ['cli.py', 'annotate', '--help'],
+    ['cli.py', 'annotate-musk', '--help'],
+    ['cli.py', 'harvest', '--help'],
+    ['cli.py', 'label', '--help'],
+    ['cli.py', 'car', '--help'],
+    ['cli.py', 'pipeline', '--list'],
+    ['-c', 'import general_annotate; general_annotate.load_stock_patterns("sp100_context.csv")'],
+]
+HEAVY = ['torch', 'transformers', 'yfinance', 'tweepy', 'matplotlib']
+
+
+def timed(args, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True)
+        best = min(best, time.perf_counter() - start)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{' '.join(args)} failed:\n{proc.stderr[-2000:]}")
+    return best
+
+
+def heavy_imports(args):
+    """Heavy top-level packages imported by a command, from python -X importtime."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime'] + args, cwd=ROOT, capture_output=True, text=True)
+    loaded = {line.rsplit('|', 1)[-1].strip() for line in proc.stderr.splitlines() if '|' in line}
+    return sorted(h for h in HEAVY if h in loaded)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that non-model commands start quickly')
+    parser.add_argument('--budget', type=float, default=1.0, help='Maximum seconds per command')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    failures = 0
+    for check in CHECKS:
+        seconds = timed(check, args.repeat)
+        heavy = heavy_imports(check)
+        ok = seconds <= args.budget and not heavy
+        failures += not ok
+        note = f"  imports {', '.join(heavy)}" if heavy else ''
+        print(f"{'ok  ' if ok else 'SLOW'} {seconds:6.3f}s  python {' '.join(check)}{note}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,126 @@
+import os
+import zlib
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Filler vocabulary; company and product terms are mixed in from the real term file
+FILLER = ('the a of to and in is for on that with this we it at be are our by will today new '
+          'market shares price great big jobs people country vote bill tax economy growth '
+          'report week year news deal plan support thanks proud work families americans').split()
+
+
+def load_terms(stocks_csv=os.path.join(ROOT, 'sp100_context.csv')):
+    """Tickers and matchable terms from the S&P 100 term file, so synthetic texts hit the real patterns."""
+    from ticker_matcher import load_terms as _load
+    terms = _load(stocks_csv)
+    tickers = sorted({t for ts in terms.values() for t in ts})
+    return tickers, sorted(terms)
+
+
+def tweets(n, seed=0, words=18, mention_rate=0.25, start='2017-01-01', end='2024-12-31'):
+    """
+    n synthetic tweets with 'id', 'date' (UTC offset strings like the congress dump),
+    'text' and 'screen_name'. About mention_rate of the texts mention a company term.
+    """
+    rng = np.random.default_rng(seed)
+    _, terms = load_terms()
+    vocab = np.asarray(FILLER, dtype=object)
+    lengths = rng.integers(words // 2, words * 3 // 2, size=n)
+    flat = vocab[rng.integers(0, len(vocab), size=int(lengths.sum()))]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    texts = [' '.join(flat[offsets[i]:offsets[i + 1]]) for i in range(n)]
+    mentions = np.flatnonzero(rng.random(n) < mention_rate)
+    picks = rng.integers(0, len(terms), size=len(mentions))
+    for i, t in zip(mentions, picks):
+        texts[i] = f"{texts[i]} {terms[t].title()} {FILLER[i % len(FILLER)]}"
+
+    lo, hi = pd.Timestamp(start, tz='UTC').value, pd.Timestamp(end, tz='UTC').value
+    ts = pd.to_datetime(np.sort(rng.integers(lo, hi, size=n)), utc=True).tz_convert('America/New_York')
+    return pd.DataFrame({
+        'id': np.arange(10**17, 10**17 + n, dtype=np.int64),
+        'screen_name': pd.Categorical.from_codes(rng.integers(0, 500, size=n),
+                                                 [f'user{i}' for i in range(500)]),
+        'date': ts.strftime('%Y-%m-%d %H:%M:%S%z'),
+        'text': texts,
+    })
+
+
+def annotated(n, seed=0):
+    """Synthetic tweets with FinBERT-like scores and comma-joined matched tickers."""
+    rng = np.random.default_rng(seed)
+    frame = tweets(n, seed)
+    tickers, _ = load_terms()
+    scores = rng.dirichlet([1.0, 2.0, 1.0], size=n).astype(np.float32)
+    frame['sent_bear'], frame['sent_neut'], frame['sent_bull'] = scores.T
+    k = rng.choice([1, 1, 1, 2, 3], size=n)
+    names = np.asarray(tickers, dtype=object)
+    frame['matched_tickers'] = [','.join(sorted(set(names[rng.integers(0, len(names), size=j)]))) for j in k]
+    return frame
+
+
+def prices(tickers, start='2016-10-01', end='2025-02-01', seed=0, market='SPY'):
+    """
+    Daily closes (business days x tickers) from a one-factor random walk,
+    with a few missing values per ticker like real delisted/halted series.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, end)
+    T, K = len(dates), len(tickers)
+    market_ret = rng.normal(0.0003, 0.011, size=T)
+    beta = rng.uniform(0.6, 1.6, size=K)
+    rets = market_ret[:, None] * beta + rng.normal(0, 0.015, size=(T, K))
+    closes = 100 * np.exp(np.cumsum(np.log1p(rets), axis=0))
+    closes[rng.random((T, K)) < 0.002] = np.nan
+    frame = pd.DataFrame(closes, index=dates, columns=list(tickers))
+    frame[market] = 100 * np.exp(np.cumsum(np.log1p(market_ret)))
+    return frame
+
+
+class FakeTokenizer:
+    """Whitespace tokenizer with the two calls score_texts makes: __call__ and pad."""
+
+    def __init__(self, vocab_size=30522, max_length=128):
+        self.vocab_size = vocab_size
+        self.max_length = max_length
+
+    def __call__(self, texts, truncation=True):
+        ids = [[101] + [zlib.crc32(w.encode()) % self.vocab_size for w in t.lower().split()][:self.max_length - 2]
+               + [102] for t in texts]
+        return {'input_ids': ids, 'attention_mask': [[1] * len(x) for x in ids]}
+
+    def pad(self, features, return_tensors='pt'):
+        import torch
+        width = max(len(x) for x in features['input_ids'])
+        return {key: torch.tensor([x + [0] * (width - len(x)) for x in rows])
+                for key, rows in features.items()}
+
+
+def fake_finbert(hidden=256, layers=2, vocab_size=30522, seed=0):
+    """
+    (tokenizer, model) pair with FinBERT's call signature and a 3-class head.
+    Model cost scales with hidden size, layers and padded sequence length.
+    """
+    import torch
+
+    class FakeFinBert(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.embed = torch.nn.Embedding(vocab_size, hidden)
+            self.layers = torch.nn.ModuleList(torch.nn.Linear(hidden, hidden) for _ in range(layers))
+            self.head = torch.nn.Linear(hidden, 3)
+
+        def forward(self, input_ids, attention_mask, **_):
+            x = self.embed(input_ids)
+            for layer in self.layers:
+                x = torch.nn.functional.gelu(layer(x))
+            mask = attention_mask.unsqueeze(-1).to(x.dtype)
+            pooled = (x * mask).sum(1) / mask.sum(1).clamp(min=1)
+            return SimpleNamespace(logits=self.head(pooled))
+
+    torch.manual_seed(seed)
+    model = FakeFinBert()
+    model.eval()
+    return FakeTokenizer(vocab_size), model
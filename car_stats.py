@@ -0,0 +1,195 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from event_study import compute_car, event_rows, window_label
+
+BUCKETS = ['bear', 'neut', 'bull']
+N_RESAMPLES = 10_000
+# Largest (resamples x events) index block drawn at once, about 32 MB of int64
+CHUNK_ELEMENTS = 4_000_000
+
+
+def _normal_p(z):
+    """Two-sided p-value of a standard normal statistic."""
+    return math.erfc(abs(z) / math.sqrt(2)) if np.isfinite(z) else np.nan
+
+
+def patell_t(scar, dof):
+    """
+    Patell Z: sum of standardized CARs over the square root of the summed
+    t-distribution variances dof / (dof - 2) of the estimation windows.
+    """
+    scar = np.asarray(scar, dtype=np.float64)
+    dof = np.asarray(dof, dtype=np.float64)
+    ok = ~np.isnan(scar) & (dof > 2)
+    if not ok.any():
+        return np.nan
+    return scar[ok].sum() / np.sqrt((dof[ok] / (dof[ok] - 2)).sum())
+
+
+def bmp_t(scar):
+    """Boehmer-Musumeci-Poulsen t: mean SCAR over its cross-sectional standard error (robust to event-day variance)."""
+    scar = np.asarray(scar, dtype=np.float64)
+    scar = scar[~np.isnan(scar)]
+    if len(scar) < 2:
+        return np.nan
+    sd = scar.std(ddof=1)
+    return scar.mean() / (sd / np.sqrt(len(scar))) if sd > 0 else np.nan
+
+
+def _chunk_means(task):
+    pool, size, n, seed = task
+    rng = np.random.default_rng(seed)
+    return pool[rng.integers(0, len(pool), size=(n, size))].mean(axis=1)
+
+
+def resample_means(pool, size, n_resamples=N_RESAMPLES, seed=0, workers=1):
+    """
+    Means of n_resamples draws of size values from pool, with replacement.
+    Draws are made as (chunk, size) index blocks, each chunk with its own child
+    seed of seed, so the result is the same whether chunks run in one process
+    or across workers processes.
+    """
+    pool = np.asarray(pool, dtype=np.float64)
+    if len(pool) == 0 or size == 0:
+        return np.full(n_resamples, np.nan)
+    chunk = max(1, CHUNK_ELEMENTS // size)
+    counts = [min(chunk, n_resamples - start) for start in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    tasks = [(pool, size, n, s) for n, s in zip(counts, seeds)]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as ex:
+            parts = list(ex.map(_chunk_means, tasks))
+    else:
+        parts = [_chunk_means(t) for t in tasks]
+    return np.concatenate(parts)
+
+
+def bootstrap_test(values, n_resamples=N_RESAMPLES, seed=0, workers=1, level=0.95):
+    """
+    Cross-sectional bootstrap of the mean: percentile confidence interval and a
+    two-sided p-value for mean == 0 from the bootstrap distribution shifted to zero.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) < 2:
+        return {'ci_low': np.nan, 'ci_high': np.nan, 'p': np.nan}
+    means = resample_means(values, len(values), n_resamples, seed, workers)
+    observed = values.mean()
+    tail = (1 - level) / 2
+    extreme = np.count_nonzero(np.abs(means - observed) >= abs(observed))
+    return {'ci_low': np.quantile(means, tail), 'ci_high': np.quantile(means, 1 - tail),
+            'p': (1 + extreme) / (1 + n_resamples)}
+
+
+def placebo_test(values, pool, n_resamples=N_RESAMPLES, seed=0, workers=1):
+    """
+    Two-sided permutation p-value of the mean of values against the means of
+    equally many CARs drawn from pool (CARs on non-event days).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    pool = np.asarray(pool, dtype=np.float64)
+    pool = pool[~np.isnan(pool)]
+    if len(values) == 0 or len(pool) == 0:
+        return np.nan
+    null = resample_means(pool, len(values), n_resamples, seed, workers)
+    center = null.mean()
+    extreme = np.count_nonzero(np.abs(null - center) >= abs(values.mean() - center))
+    return (1 + extreme) / (1 + n_resamples)
+
+
+def placebo_pool(returns, event_times, ticker, window, market=None, factors=None):
+    """
+    CARs of ticker over window, with the same normal-return model, on every
+    trading day of returns that is not an event day: the null distribution
+    for the placebo tests.
+    """
+    dates = pd.DatetimeIndex(returns.index)
+    taken = np.zeros(len(dates), dtype=bool)
+    rows = event_rows(dates, event_times)
+    taken[rows[rows < len(dates)]] = True
+    days = dates[~taken]
+    # Midnight UTC on a session date falls before that session's close, so each day maps to itself
+    cars = compute_car(returns, pd.Series(days.tz_localize('UTC') if days.tz is None else days),
+                       [ticker] * len(days), windows=[window], market=market, factors=factors)
+    pool = cars[window_label(window)].to_numpy()
+    return pool[~np.isnan(pool)]
+
+
+def placebo_p(values, pool):
+    """Per-event two-sided empirical p-value of each value within the placebo pool."""
+    values = np.asarray(values, dtype=np.float64)
+    pool = np.sort(np.asarray(pool, dtype=np.float64))
+    if len(pool) == 0:
+        return np.full(len(values), np.nan)
+    below = np.searchsorted(pool, values, side='right')
+    above = len(pool) - np.searchsorted(pool, values, side='left')
+    p = np.minimum(1.0, 2 * (1 + np.minimum(below, above)) / (1 + len(pool)))
+    return np.where(np.isnan(values), np.nan, p)
+
+
+def sentiment_buckets(frame):
+    """bear/neut/bull label of each row by its largest sent_* score; None without scores."""
+    cols = [f'sent_{b}' for b in BUCKETS]
+    if not set(cols) <= set(frame.columns):
+        return pd.Series(None, index=frame.index, dtype=object)
+    scores = frame[cols].to_numpy(dtype=np.float64)
+    labels = np.asarray(BUCKETS, dtype=object)[np.nan_to_num(scores, nan=-1).argmax(axis=1)]
+    return pd.Series(np.where(np.isnan(scores).all(axis=1), None, labels), index=frame.index)
+
+
+def event_tests(car, scar, dof, buckets=None, pool=None, n_resamples=N_RESAMPLES, seed=0, workers=1):
+    """
+    Significance of mean CAR for all events and per sentiment bucket: Patell Z,
+    BMP t, bootstrap confidence interval and p-value, and the placebo p-value
+    against non-event days when a pool is given. One row per group.
+    """
+    car = np.asarray(car, dtype=np.float64)
+    scar = np.asarray(scar, dtype=np.float64)
+    dof = np.asarray(dof, dtype=np.float64)
+    groups = [('all', np.ones(len(car), dtype=bool))]
+    if buckets is not None:
+        buckets = np.asarray(buckets, dtype=object)
+        groups += [(b, buckets == b) for b in BUCKETS]
+    rows = []
+    for name, mask in groups:
+        c = car[mask]
+        c = c[~np.isnan(c)]
+        patell = patell_t(scar[mask], dof[mask])
+        bmp = bmp_t(scar[mask])
+        boot = bootstrap_test(c, n_resamples, seed, workers)
+        rows.append({
+            'group': name, 'n': len(c),
+            'mean_car': c.mean() if len(c) else np.nan, 'median_car': np.median(c) if len(c) else np.nan,
+            'patell_z': patell, 'patell_p': _normal_p(patell), 'bmp_t': bmp, 'bmp_p': _normal_p(bmp),
+            'boot_ci_low': boot['ci_low'], 'boot_ci_high': boot['ci_high'], 'boot_p': boot['p'],
+            'placebo_p': placebo_test(c, pool, n_resamples, seed, workers) if pool is not None else np.nan,
+        })
+    out = pd.DataFrame(rows).set_index('group')
+    if pool is not None:
+        out['placebo_days'] = len(pool)
+    return out
+
+
+def group_tests(frame, by, car='CAR', scar='SCAR', dof='est_dof'):
+    """
+    n, mean and median CAR with Patell Z and BMP t per group of frame, all
+    groups at once from grouped sums (no per-group loop).
+    """
+    valid = frame[frame[car].notna()]
+    ok = valid[scar].notna() & (valid[dof] > 2)
+    parts = pd.DataFrame({
+        'car': valid[car], 'scar': valid[scar].where(ok),
+        'patell_var': (valid[dof] / (valid[dof] - 2)).where(ok),
+    })
+    keys = [valid[k] for k in ([by] if isinstance(by, str) else by)]
+    g = parts.groupby(keys, dropna=False)
+    out = pd.DataFrame({'n': g['car'].count(), 'mean_car': g['car'].mean(), 'median_car': g['car'].median()})
+    with np.errstate(invalid='ignore', divide='ignore'):
+        out['patell_z'] = g['scar'].sum(min_count=1) / np.sqrt(g['patell_var'].sum(min_count=1))
+        out['bmp_t'] = g['scar'].mean() / (g['scar'].std(ddof=1) / np.sqrt(g['scar'].count()))
+    out['patell_p'] = out['patell_z'].map(_normal_p)
+    out['bmp_p'] = out['bmp_t'].map(_normal_p)
+    return out[['n', 'mean_car', 'median_car', 'patell_z', 'patell_p', 'bmp_t', 'bmp_p']]
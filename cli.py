@@ -0,0 +1,58 @@
+import os
+import runpy
+import sys
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> (script relative to the repository root, summary).
+# Scripts are only loaded when their command runs, so listing commands and
+# most --help calls never import torch, transformers, yfinance, tweepy or matplotlib.
+COMMANDS = {
+    'harvest': ('harvest.py', 'Harvest one day of tweets and price bars (tweepy)'),
+    'harvest-async': ('harvest_async.py', 'Concurrent, resumable tweet harvester'),
+    'tweets': ('tweet_store.py', 'Ingest or query the partitioned Parquet tweet store'),
+    'annotate': ('general_annotate.py', 'Ticker-match and FinBERT-score congress/stock tweets'),
+    'dedup': ('dedup.py', 'Cluster retweets and near-duplicate tweets'),
+    'serve': ('score_server.py', 'Serve FinBERT scores from one warm model to many jobs'),
+    'annotate-musk': ('musk/annotate.py', 'FinBERT-score Tesla-related Musk tweets'),
+    'filter-musk-year': ('musk/filter_musk_year.py', 'Slice the Musk dump to one year'),
+    'label': ('pilot_study/eval.py', 'Label annotated tweets with price moves'),
+    'evaluate': ('pilot_study/eval_results.py', 'Macro-F1 eps surface and confusion matrix'),
+    'car': ('musk/car_manuel.py', 'Event-study CAR for Tesla tweets'),
+    'cross-section': ('cross_section.py', 'CAR for every (tweet, S&P 100 ticker) pair, by ticker/sector/sentiment'),
+    'intraday': ('intraday_study.py', 'Minute-level abnormal returns after each tweet'),
+    'analyze-musk': ('musk/analyze_musk_tsla.py', 'Plot TSLA against Tesla tweets for a year'),
+    'match-bench': ('ticker_matcher.py', 'Compare the ticker matchers on a text column'),
+    'check-backend': ('sentiment.py', 'Compare an inference backend with fp32 FinBERT'),
+    'pipeline': ('pipeline.py', 'Run the stage-cached pipeline'),
+    'bench': ('benchmarks/run.py', 'Time the hot paths on synthetic data'),
+    'startup': ('benchmarks/startup.py', 'Check CLI startup time'),
+}
+
+
+def usage():
+    lines = ['usage: python cli.py <command> [args...]', '', 'commands:']
+    lines += [f"  {name:<18}{summary}" for name, (_, summary) in COMMANDS.items()]
+    lines += ['', "Run 'python cli.py <command> --help' for a command's options."]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage())
+        return 0
+    name, rest = argv[0], argv[1:]
+    if name not in COMMANDS:
+        sys.stderr.write(f"unknown command {name!r}\n\n{usage()}\n")
+        return 2
+    script = os.path.join(ROOT, COMMANDS[name][0])
+    # Run the script as if it had been started directly
+    sys.argv = [script] + rest
+    sys.path.insert(0, os.path.dirname(script))
+    runpy.run_path(script, run_name='__main__')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+from price_store import PriceStore
+from event_study import ESTIMATION_WINDOW, compute_car, load_ff_factors, window_label
+from trading_calendar import EXCHANGE_TZ, get_calendar
+from annotated import exploded, load_annotated, take
+import car_stats
+import dedup
+import metrics as instrumentation
+from metrics import metrics
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+MATRIX_DIR = os.path.join(ROOT, 'cache', 'returns')
+SECTORS_CACHE = os.path.join(ROOT, 'cache', 'sectors.json')
+MARKET = 'SPY'
+EVENT_WINDOWS = [(1, 3), (0, 1), (-1, 5)]
+
+
+def _matrix_path(tickers, start, end):
+    key = json.dumps([list(tickers), str(start), str(end)])
+    return os.path.join(MATRIX_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest()[:16])
+
+
+def _sessions_closed(end, now=None):
+    """Whether every session in the whole-day range ending at end has closed by now."""
+    cal = get_calendar()
+    now = pd.Timestamp.now(tz='UTC') if now is None else now
+    end = pd.Timestamp(end)
+    if end.tz is not None:
+        end = end.tz_convert(EXCHANGE_TZ).tz_localize(None)
+    end_day = end.normalize() + (pd.Timedelta(days=1) if end != end.normalize() else pd.Timedelta(0))
+    # The first session still open (or not yet started) must lie at or after the exclusive end
+    pending = cal.event_sessions([now])[0]
+    return pending >= 0 and end_day <= cal.sessions[pending]
+
+
+def build_returns(store, tickers, start, end):
+    """
+    Dates x tickers daily close-to-close returns on the union of the tickers'
+    trading days. Tickers whose bars could not be loaded have no column.
+    """
+    columns = {}
+    for ticker in tickers:
+        try:
+            bars = store.get_bars(ticker, start, end)
+        except Exception as e:
+            print(f"{ticker}: no prices ({e})")
+            continue
+        if not bars.empty:
+            columns[ticker] = bars['Close']
+    closes = pd.DataFrame(columns).sort_index()
+    # fill_method=None keeps a missing close from turning into a zero return
+    return closes.pct_change(fill_method=None).iloc[1:]
+
+
+def returns_matrix(store, tickers, start, end, persist=True):
+    """
+    Aligned dates x tickers returns as one C-contiguous float64 block. With
+    persist, the block is saved under cache/returns as .npy (plus a .json with
+    dates and columns) and later runs over the same tickers and range
+    memory-map it instead of re-reading the price store. A block missing any
+    requested ticker is not saved, so the next run tries those tickers again,
+    and neither is a range reaching a session that has not closed yet, whose
+    bars are still to come.
+    """
+    path = _matrix_path(tickers, start, end)
+    persist = persist and _sessions_closed(end)
+    if persist and os.path.exists(path + '.npy') and os.path.exists(path + '.json'):
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        # A block saved without some tickers (before incomplete blocks were skipped) is rebuilt
+        if meta['columns'] == list(tickers):
+            values = np.load(path + '.npy', mmap_mode='r')
+            index = pd.DatetimeIndex(np.asarray(meta['dates'], dtype='datetime64[ns]'), name='Date')
+            return pd.DataFrame(values, index=index, columns=meta['columns'], copy=False)
+    frame = build_returns(store, tickers, start, end)
+    values = np.ascontiguousarray(frame.to_numpy(dtype=np.float64))
+    missing = [t for t in tickers if t not in frame.columns]
+    metrics.count('tickers_missing', len(missing))
+    if missing:
+        print(f"No returns for {len(missing)} of {len(tickers)} tickers ({', '.join(missing[:10])}"
+              f"{', ...' if len(missing) > 10 else ''}); not caching the returns matrix")
+    elif persist:
+        os.makedirs(MATRIX_DIR, exist_ok=True)
+        np.save(path + '.npy', values)
+        with open(path + '.json', 'w') as f:
+            json.dump({'columns': list(frame.columns),
+                       'dates': frame.index.as_unit('ns').asi8.tolist()}, f)
+    return pd.DataFrame(values, index=frame.index, columns=frame.columns, copy=False)
+
+
+def load_sectors(tickers, sectors_csv=None):
+    """
+    Ticker -> sector from a Ticker,Sector CSV, or else from Yahoo company info
+    cached in cache/sectors.json. Unknown tickers map to 'Unknown'.
+    """
+    if sectors_csv:
+        table = pd.read_csv(sectors_csv)
+        return {t: s for t, s in zip(table['Ticker'], table['Sector'])}
+    known = {}
+    if os.path.exists(SECTORS_CACHE):
+        with open(SECTORS_CACHE) as f:
+            known = json.load(f)
+    missing = [t for t in tickers if t not in known]
+    if missing:
+        try:
+            import yfinance as yf
+        except ImportError:
+            missing = []
+        for ticker in missing:
+            try:
+                known[ticker] = yf.Ticker(ticker).info.get('sector') or 'Unknown'
+            except Exception:
+                # Offline or rate-limited: leave the rest for a later run
+                break
+        os.makedirs(os.path.dirname(SECTORS_CACHE), exist_ok=True)
+        with open(SECTORS_CACHE, 'w') as f:
+            json.dump(known, f, indent=1, sort_keys=True)
+    return {t: known.get(t, 'Unknown') for t in tickers}
+
+
+def event_pairs(tweets, csr, time_col='date'):
+    """One row per (tweet, ticker) match: tweet row position, event time and ticker."""
+    pairs = exploded(csr)
+    rows = pairs['row'].to_numpy()
+    return pd.DataFrame({'row': rows, 'time': tweets[time_col].to_numpy()[rows],
+                         'ticker': pairs['ticker'].astype(str).to_numpy()})
+
+
+def price_range(event_times, windows=EVENT_WINDOWS, estimation=ESTIMATION_WINDOW):
+    """[start, end) dates covering every event's estimation and event windows, plus the first return."""
+    cal = get_calendar()
+    sessions = cal.event_sessions(event_times)
+    sessions = sessions[sessions >= 0]
+    first = min(estimation[0], *(w[0] for w in windows)) - 1
+    start = cal.session_dates(cal.offset(sessions.min(keepdims=True), first))
+    end = cal.session_dates(cal.offset(sessions.max(keepdims=True), max(w[1] for w in windows)))
+    return start[0], end[0] + pd.Timedelta(days=1)
+
+
+def cross_section(tweets, csr, returns, sectors, time_col='date', id_col='id', windows=EVENT_WINDOWS, model='market',
+                  market=MARKET, factors=None):
+    """
+    CAR of every (tweet, ticker) pair in one compute_car pass over the shared
+    returns matrix, with the pair's ticker, sector and sentiment bucket.
+    """
+    if model == 'market' and market not in returns.columns:
+        raise ValueError(f"No returns for the market {market}; the market model cannot be estimated")
+    pairs = event_pairs(tweets, csr, time_col)
+    pairs = pairs[pairs['ticker'] != market]
+    priced = pairs['ticker'].isin(returns.columns).to_numpy()
+    if not priced.all():
+        dropped = pairs.loc[~priced, 'ticker'].value_counts()
+        print(f"Dropping {int(dropped.sum())} (tweet, ticker) pairs without returns: "
+              + ', '.join(f'{t} ({n})' for t, n in dropped.items()))
+        metrics.count('event_pairs_dropped', int(dropped.sum()))
+    pairs = pairs[priced]
+    market_returns = returns[market] if model == 'market' else None
+    with metrics.timer('compute_car', items=len(pairs)):
+        cars = compute_car(returns, pairs['time'], pairs['ticker'].to_numpy(), windows=windows,
+                           market=market_returns, factors=factors if model == 'ff' else None)
+    metrics.count('event_pairs', len(pairs))
+    rows = pairs['row'].to_numpy()
+    out = pd.DataFrame({
+        'id': tweets[id_col].to_numpy()[rows],
+        'date': pairs['time'].to_numpy(),
+        'ticker': pairs['ticker'].to_numpy(),
+        'sector': pairs['ticker'].map(sectors).fillna('Unknown').to_numpy(),
+        'sentiment': car_stats.sentiment_buckets(tweets).to_numpy()[rows],
+        'event_date': cars['event_date'].to_numpy(),
+        'CAR': cars[window_label(windows[0])].to_numpy(),
+    })
+    for window in windows[1:]:
+        out[window_label(window)] = cars[window_label(window)].to_numpy()
+    for col in ['alpha', 'beta', 'resid_var', 'est_dof']:
+        out[col] = cars[col].to_numpy()
+    out['SCAR'] = cars[window_label(windows[0], 'SCAR')].to_numpy()
+    return out
+
+
+def summarize(pairs):
+    """group_tests by ticker, sector and sentiment, stacked with a 'by' column."""
+    parts = []
+    for by in ['ticker', 'sector', 'sentiment']:
+        tests = car_stats.group_tests(pairs, by)
+        tests.index = tests.index.rename('group')
+        parts.append(tests.reset_index().assign(by=by))
+    summary = pd.concat(parts, ignore_index=True)
+    return summary[['by', 'group'] + [c for c in summary.columns if c not in ('by', 'group')]]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cross-sectional CAR for every (tweet, S&P 100 ticker) match')
+    parser.add_argument('input_csv', nargs='?', default='annotate_congress.csv',
+                        help="Annotated tweets (CSV with a comma-separated 'matched_tickers' column, or Parquet)")
+    parser.add_argument('--time-col', default='date')
+    parser.add_argument('--id-col', default='id')
+    parser.add_argument('--model', choices=['mean', 'market', 'ff'], default='market')
+    parser.add_argument('--ff-factors', help='Ken French daily factors CSV, required for --model ff')
+    parser.add_argument('--stocks', default='sp100_context.csv', help='Universe of the shared returns matrix')
+    parser.add_argument('--sectors', help='Ticker,Sector CSV; otherwise Yahoo sector info cached in cache/')
+    parser.add_argument('--dedup', type=float, nargs='?', const=dedup.THRESHOLD, metavar='THRESHOLD',
+                        help='Count retweets and near-duplicate tweets on the same trading day as one event')
+    parser.add_argument('--in-memory', action='store_true',
+                        help='Do not save or memory-map the returns matrix under cache/returns')
+    parser.add_argument('--output', default='cross_section_cars.csv')
+    parser.add_argument('--summary', default='cross_section_summary.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    if args.model == 'ff' and not args.ff_factors:
+        parser.error('--model ff needs --ff-factors')
+
+    with instrumentation.instrumented(args, 'cross_section'):
+        tweets, csr = load_annotated(args.input_csv)
+        matched = np.flatnonzero(np.diff(csr.offsets) > 0)
+        tweets, csr = tweets.iloc[matched].reset_index(drop=True), take(csr, matched)
+        if args.dedup is not None:
+            with metrics.timer('dedup', items=len(tweets)):
+                clusters = dedup.clusters(tweets, 'text', args.time_col, threshold=args.dedup)
+                event_pos = dedup.event_clusters(clusters, tweets[args.time_col])
+            canon, _ = dedup.canonical(event_pos)
+            print(f"{len(tweets)} tweets form {len(canon)} events after collapsing duplicates")
+            tweets, csr = tweets.iloc[canon].reset_index(drop=True), take(csr, canon)
+
+        # The whole universe plus the market, so every run over the same period shares one matrix
+        universe = set(pd.read_csv(args.stocks)['Ticker']) | set(csr.tickers[np.unique(csr.indices)])
+        tickers = sorted(universe - {MARKET}) + [MARKET]
+        start, end = price_range(tweets[args.time_col])
+        with metrics.timer('load_returns'):
+            returns = returns_matrix(PriceStore(), tickers, start, end, persist=not args.in_memory)
+        factors = load_ff_factors(args.ff_factors) if args.model == 'ff' else None
+        sectors = load_sectors(tickers[:-1], args.sectors)
+
+        pairs = cross_section(tweets, csr, returns, sectors, args.time_col, args.id_col, model=args.model,
+                              factors=factors)
+        summary = summarize(pairs)
+        pairs.to_csv(args.output, index=False)
+        summary.to_csv(args.summary, index=False)
+
+    print(f"{len(pairs)} (tweet, ticker) pairs over {returns.shape[1] - 1} tickers and {len(returns)} days")
+    print(summary[summary['by'] != 'ticker'].to_string(index=False, float_format=lambda x: f'{x:.4g}'))
+    print(f"Saved pair CARs to {args.output} and the grouped tests to {args.summary}")
@@ -0,0 +1,202 @@
+import argparse
+import numpy as np
+import pandas as pd
+from trading_calendar import get_calendar
+
+THRESHOLD = 0.8
+NUM_PERM = 64
+BANDS = 16
+SHINGLE = 5
+# Largest (permutations x shingles) block hashed at once, about 32 MB of uint64
+CHUNK_ELEMENTS = 4_000_000
+
+
+def normalize(texts):
+    """Lowercased text without retweet prefixes, links, punctuation or repeated whitespace."""
+    s = pd.Series(texts, dtype=object).fillna('').astype(str).str.lower()
+    s = s.str.replace(r'^rt @\w+:?\s*', '', regex=True)
+    s = s.str.replace(r'https?://\S+', ' ', regex=True)
+    s = s.str.replace(r'[^\w@$#]+', ' ', regex=True)
+    return s.str.strip()
+
+
+def _shingle_hashes(texts, k=SHINGLE):
+    """
+    Polynomial hashes of every k-character shingle, as a flat uint64 array plus
+    per-text offsets (CSR). Texts shorter than k are padded to one shingle.
+    """
+    encoded = [t.ljust(k).encode('utf-8') for t in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buf = np.frombuffer(b''.join(encoded), dtype=np.uint8).astype(np.uint64)
+    starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    counts = lengths - k + 1
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    pos = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+    h = np.zeros(len(pos), dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            h = h * np.uint64(1_000_003) + buf[pos + j]
+    return h, offsets
+
+
+def minhash(texts, num_perm=NUM_PERM, k=SHINGLE, seed=0):
+    """
+    (n, num_perm) MinHash signatures of the texts' character shingles. Each
+    permutation is a multiply-shift hash; the minimum per text is taken with
+    reduceat over the shingle offsets, in blocks of texts to bound memory.
+    """
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+    h, offsets = _shingle_hashes(list(texts), k)
+    sig = np.empty((len(offsets) - 1, num_perm), dtype=np.uint32)
+    per_block = max(1, CHUNK_ELEMENTS // num_perm)
+    lo = 0
+    while lo < len(sig):
+        # Whole texts until the block's shingle budget is used up
+        hi = max(lo + 1, int(np.searchsorted(offsets, offsets[lo] + per_block, side='right')) - 1)
+        hi = min(hi, len(sig))
+        # Permutations x shingles, so reduceat runs along contiguous rows
+        values = np.multiply(a[:, None], h[None, offsets[lo]:offsets[hi]])
+        values += b[:, None]
+        values >>= np.uint64(32)
+        sig[lo:hi] = np.minimum.reduceat(values, offsets[lo:hi] - offsets[lo], axis=1).T
+        lo = hi
+    return sig
+
+
+def _candidate_pairs(sig, bands):
+    """Pairs sharing an LSH band bucket, each member paired with its bucket's first member."""
+    n, num_perm = sig.shape
+    rows = num_perm // bands
+    mix = np.random.default_rng(1).integers(1, 2 ** 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    left, right = [], []
+    for band in range(bands):
+        with np.errstate(over='ignore'):
+            keys = (sig[:, band * rows:(band + 1) * rows].astype(np.uint64) * mix).sum(axis=1)
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        new_bucket = np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]])
+        first = order[np.flatnonzero(new_bucket)][np.cumsum(new_bucket) - 1]
+        pair = first != order
+        left.append(first[pair])
+        right.append(order[pair])
+    return np.concatenate(left), np.concatenate(right)
+
+
+def _components(n, left, right):
+    """Smallest member index of each node's connected component, by min-label propagation."""
+    labels = np.arange(n)
+    while len(left):
+        roots_l, roots_r = labels[left], labels[right]
+        if np.array_equal(roots_l, roots_r):
+            break
+        low = np.minimum(roots_l, roots_r)
+        np.minimum.at(labels, roots_l, low)
+        np.minimum.at(labels, roots_r, low)
+        # Pointer jumping until every node points at its root
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+    return labels
+
+
+def cluster_labels(texts, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, k=SHINGLE, seed=0):
+    """
+    Position of each text's canonical member, the first text of its cluster in
+    the given order. Texts equal after normalize() are grouped exactly; the
+    distinct ones are clustered by MinHash/LSH, linking candidate pairs whose
+    estimated shingle Jaccard similarity is at least threshold. threshold=1
+    only groups exact duplicates.
+    """
+    norm = normalize(texts).to_numpy(dtype=object)
+    if len(norm) == 0:
+        return np.empty(0, dtype=np.int64)
+    keys = pd.util.hash_array(norm)
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    # Distinct texts in order of first appearance, so a component's minimum is its earliest text
+    order = np.argsort(first, kind='stable')
+    reps = first[order]
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    if threshold < 1 and len(reps) > 1:
+        sig = minhash(norm[reps], num_perm, k, seed)
+        left, right = _candidate_pairs(sig, bands)
+        similar = (sig[left] == sig[right]).mean(axis=1) >= threshold
+        rep_labels = _components(len(reps), left[similar], right[similar])
+    else:
+        rep_labels = np.arange(len(reps))
+    return reps[rep_labels[rank[inverse.ravel()]]].astype(np.int64)
+
+
+def clusters(frame, text_col, time_col=None, **kwargs):
+    """
+    Row position of each row's canonical member: the earliest row by time_col
+    (or the first row) among its exact and near duplicates.
+    """
+    if time_col is not None and time_col in frame.columns:
+        times = pd.to_datetime(frame[time_col], utc=True, errors='coerce', format='mixed')
+        order = np.argsort(times.to_numpy(), kind='stable')
+    else:
+        order = np.arange(len(frame))
+    labels = cluster_labels(frame[text_col].to_numpy()[order], **kwargs)
+    rows = np.empty(len(frame), dtype=np.int64)
+    rows[order] = order[labels]
+    return rows
+
+
+def event_clusters(rows, event_times, calendar=None):
+    """
+    Row position of each tweet's canonical event: the earliest member of its
+    cluster with the same event trading day. A repeat on another day stays a
+    separate event, since it meets a different price reaction.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    times = pd.to_datetime(pd.Series(event_times), utc=True, errors='coerce', format='mixed')
+    sessions = (calendar or get_calendar()).event_sessions(times)
+    order = np.argsort(times.to_numpy(), kind='stable')
+    first = pd.Series(order).groupby([rows[order], sessions[order]], sort=False).transform('first').to_numpy()
+    out = np.empty(len(rows), dtype=np.int64)
+    out[order] = first
+    return out
+
+
+def canonical(rows):
+    """Sorted canonical row positions and, for every row, the index of its canonical among them."""
+    canon, inverse = np.unique(rows, return_inverse=True)
+    return canon, inverse.ravel()
+
+
+def add_cluster_columns(frame, rows, id_col='id'):
+    """canonical_id (id of the canonical row) and cluster_size for every row of frame."""
+    canon, inverse = canonical(rows)
+    ids = frame[id_col].to_numpy() if id_col in frame.columns else np.arange(len(frame))
+    frame['canonical_id'] = ids[rows]
+    frame['cluster_size'] = np.bincount(inverse)[inverse]
+    return frame
+
+
+def broadcast(values, rows):
+    """Values computed for the canonical rows (in canonical() order) repeated onto every member."""
+    _, inverse = canonical(rows)
+    return np.asarray(values)[inverse]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster exact and near-duplicate tweets')
+    parser.add_argument('input_csv')
+    parser.add_argument('output_csv', help='Input rows with canonical_id and cluster_size columns')
+    parser.add_argument('--text-col', default='text')
+    parser.add_argument('--time-col', help='Keep the earliest tweet of each cluster as canonical')
+    parser.add_argument('--id-col', default='id')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='Estimated Jaccard similarity to link')
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input_csv)
+    rows = clusters(df, args.text_col, args.time_col, threshold=args.threshold)
+    add_cluster_columns(df, rows, args.id_col).to_csv(args.output_csv, index=False)
+    n_canon = len(np.unique(rows))
+    print(f"{len(df)} tweets in {n_canon} clusters ({1 - n_canon / max(len(df), 1):.1%} duplicates) "
+          f"to {args.output_csv}")
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+from trading_calendar import get_calendar
+
+# Windows are inclusive trading-day offsets relative to the event day
+ESTIMATION_WINDOW = (-20, -1)
+DEFAULT_WINDOWS = [(1, 3)]
+
+
+def window_label(window, prefix='CAR'):
+    """Column name for a window, e.g. (-1, 5) -> 'CAR_m1_5'."""
+    fmt = lambda x: f'm{-x}' if x < 0 else str(x)
+    return f'{prefix}_{fmt(window[0])}_{fmt(window[1])}'
+
+
+def event_rows(dates, event_times, calendar=None):
+    """
+    Row of each event's trading day in a daily index: the NYSE session the event
+    can first affect (after-close, weekend and holiday events roll forward), or
+    the next row with data when that session has no bar.
+    """
+    days = (calendar or get_calendar()).event_days(event_times)
+    rows = np.asarray(pd.DatetimeIndex(dates).searchsorted(days, side='left'), dtype=np.int64)
+    # Events outside the calendar get a row past the end, so every window is empty
+    rows[days.isna()] = len(dates)
+    return rows
+
+
+def load_ff_factors(path):
+    """Load a Ken French daily factor CSV (percent units) as a decimal-return frame indexed by date."""
+    with open(path) as f:
+        lines = f.readlines()
+    header = next(i for i, line in enumerate(lines) if 'Mkt-RF' in line)
+    factors = pd.read_csv(path, skiprows=header, index_col=0)
+    factors.index = pd.to_datetime(factors.index.astype(str).str.strip(), format='%Y%m%d', errors='coerce')
+    factors = factors[factors.index.notna()]
+    factors.columns = factors.columns.str.strip()
+    return factors.apply(pd.to_numeric, errors='coerce') / 100
+
+
+def _cumulative(values):
+    """Prefix sums with a leading zero row, so rows [lo, hi) sum to c[hi] - c[lo]."""
+    out = np.zeros((values.shape[0] + 1,) + values.shape[1:], dtype=np.float64)
+    np.cumsum(values, axis=0, out=out[1:])
+    return out
+
+
+def _window_sum(cum, rows, cols, window):
+    """Sum over rows+window[0] .. rows+window[1] for every event; NaN where the window leaves the data."""
+    lo = rows + window[0]
+    hi = rows + window[1] + 1
+    ok = (cols >= 0) & (lo >= 0) & (hi <= cum.shape[0] - 1)
+    out = np.full(rows.shape + cum.shape[2:], np.nan)
+    out[ok] = cum[hi[ok], cols[ok]] - cum[lo[ok], cols[ok]]
+    return out
+
+
+def _design(returns, market=None, factors=None):
+    """
+    Dependent returns (T, K) and regressors with a leading constant (T, p).
+    The factor model uses excess returns when factors carry an RF column.
+    """
+    y = returns.to_numpy(dtype=np.float64)
+    regressors = [np.ones(len(returns))]
+    names = []
+    if factors is not None:
+        factors = factors.reindex(returns.index)
+        if 'RF' in factors.columns:
+            y = y - factors['RF'].to_numpy(dtype=np.float64)[:, None]
+            factors = factors.drop(columns='RF')
+        regressors += [factors[c].to_numpy(dtype=np.float64) for c in factors.columns]
+        names = list(factors.columns)
+    elif market is not None:
+        regressors.append(pd.Series(market).reindex(returns.index).to_numpy(dtype=np.float64))
+        names = ['market']
+    return y, np.column_stack(regressors), names
+
+
+def compute_car(returns, event_times, tickers, windows=DEFAULT_WINDOWS, estimation=ESTIMATION_WINDOW,
+                market=None, factors=None):
+    """
+    Abnormal returns and CAR for every event in one pass.
+
+    returns is a dates x tickers frame of daily returns; event_times and tickers
+    give one entry per event. The normal-return model is the constant mean by
+    default, the market model when a market return series is given, or a factor
+    model (e.g. Fama-French) when a dates x factors frame is given.
+    All event regressions are solved together from prefix sums of the
+    regression moments, so the cost does not grow with a per-event loop.
+
+    Returns a frame in event order with alpha, beta, residual variance and,
+    per window, CAR and standardized CAR (SCAR).
+    """
+    y, X, names = _design(returns, market, factors)
+    p = X.shape[1]
+    valid = ~np.isnan(y) & ~np.isnan(X).any(axis=1)[:, None]
+    y0 = np.where(valid, y, 0.0)
+    vX = np.where(valid[:, :, None], np.nan_to_num(X)[:, None, :], 0.0)  # (T, K, p)
+
+    # Prefix sums of the regression moments per ticker
+    cum_n = _cumulative(valid.astype(np.float64))
+    cum_y = _cumulative(y0)
+    cum_yy = _cumulative(y0 * y0)
+    cum_X = _cumulative(vX)
+    cum_Xy = _cumulative(vX * y0[:, :, None])
+    cum_XX = _cumulative(vX[:, :, :, None] * vX[:, :, None, :])
+
+    rows = event_rows(returns.index, event_times)
+    cols = np.asarray(returns.columns.get_indexer(pd.Index(tickers)), dtype=np.int64)
+
+    # Batched OLS over every event's estimation window
+    n = _window_sum(cum_n, rows, cols, estimation)
+    XX = _window_sum(cum_XX, rows, cols, estimation)
+    Xy = _window_sum(cum_Xy, rows, cols, estimation)
+    yy = _window_sum(cum_yy, rows, cols, estimation)
+    ok = n > p
+    XX_inv = np.full(XX.shape, np.nan)
+    if ok.any():
+        XX_inv[ok] = np.linalg.pinv(XX[ok])
+    coef = np.einsum('eij,ej->ei', XX_inv, Xy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resid_var = np.where(ok, (yy - np.einsum('ei,ei->e', coef, Xy)) / (n - p), np.nan)
+
+    out = pd.DataFrame({'event_row': rows, 'alpha': coef[:, 0]})
+    out['beta'] = coef[:, 1] if p > 1 else np.nan
+    for j, name in enumerate(names[1:], start=2):
+        out[f'beta_{name}'] = coef[:, j]
+    out['resid_var'] = resid_var
+    out['est_n'] = n
+    out['est_dof'] = n - p
+
+    dates = pd.DatetimeIndex(returns.index)
+    in_range = (rows >= 0) & (rows < len(dates))
+    event_date = np.full(len(rows), np.datetime64('NaT'), dtype='datetime64[ns]')
+    event_date[in_range] = dates.values[rows[in_range]]
+    out['event_date'] = event_date
+
+    for window in windows:
+        length = _window_sum(cum_n, rows, cols, window)
+        ret_sum = _window_sum(cum_y, rows, cols, window)
+        X_sum = _window_sum(cum_X, rows, cols, window)
+        car = np.where(length > 0, ret_sum - np.einsum('ei,ei->e', coef, X_sum), np.nan)
+        # Var(CAR) includes the estimation error of the coefficients
+        var = resid_var * (length + np.einsum('ei,eij,ej->e', X_sum, XX_inv, X_sum))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            scar = np.where(var > 0, car / np.sqrt(var), np.nan)
+        out[window_label(window)] = car
+        out[window_label(window, 'SCAR')] = scar
+    return out
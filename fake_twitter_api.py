@@ -0,0 +1,102 @@
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+from aiohttp import web
+
+# Local stand-in for the v2 endpoints used by harvest_async.py, so harvesting can be exercised offline
+
+
+class FakeApi:
+    """Serves generated timelines with v2-style pagination and x-rate-limit-* headers."""
+
+    def __init__(self, users=50, tweets_per_user=250, limit=60, window=15.0):
+        self.limit = limit
+        self.window = window
+        self.calls = {}
+        self.timelines = {}
+        self.ids = {}
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        next_id = 1_000_000
+        for u in range(users):
+            handle = f'member{u}'
+            user_id = str(10_000 + u)
+            self.ids[handle.lower()] = user_id
+            timeline = []
+            for t in range(tweets_per_user):
+                next_id += 1
+                created = start + timedelta(minutes=37 * t + u)
+                timeline.append({'id': str(next_id), 'created_at': created.isoformat().replace('+00:00', 'Z'),
+                                 'text': f'{handle} tweet {t} about $AAPL and Tesla'})
+            # Timelines are returned newest first
+            self.timelines[user_id] = timeline[::-1]
+
+    def _rate_limit(self, endpoint):
+        """Fixed-window budget per endpoint; returns (allowed, headers)."""
+        now = time.time()
+        reset, used = self.calls.get(endpoint, (now + self.window, 0))
+        if now >= reset:
+            reset, used = now + self.window, 0
+        used += 1
+        self.calls[endpoint] = (reset, used)
+        headers = {'x-rate-limit-limit': str(self.limit),
+                   'x-rate-limit-remaining': str(max(self.limit - used, 0)),
+                   'x-rate-limit-reset': str(int(reset))}
+        return used <= self.limit, headers
+
+    async def user_by_username(self, request):
+        allowed, headers = self._rate_limit('users')
+        if not allowed:
+            return web.json_response({'title': 'Too Many Requests'}, status=429, headers=headers)
+        user_id = self.ids.get(request.match_info['username'].lower())
+        if user_id is None:
+            return web.json_response({'errors': [{'detail': 'Could not find user'}]}, headers=headers)
+        return web.json_response({'data': {'id': user_id, 'username': request.match_info['username']}},
+                                 headers=headers)
+
+    async def user_tweets(self, request):
+        allowed, headers = self._rate_limit('tweets')
+        if not allowed:
+            return web.json_response({'title': 'Too Many Requests'}, status=429, headers=headers)
+        timeline = self.timelines.get(request.match_info['user_id'], [])
+        q = request.query
+        if 'since_id' in q:
+            timeline = [t for t in timeline if int(t['id']) > int(q['since_id'])]
+        if 'start_time' in q:
+            timeline = [t for t in timeline if _parse(t['created_at']) >= _parse(q['start_time'])]
+        if 'end_time' in q:
+            timeline = [t for t in timeline if _parse(t['created_at']) < _parse(q['end_time'])]
+        offset = int(q.get('pagination_token', 0))
+        size = min(int(q.get('max_results', 10)), 100)
+        page = timeline[offset:offset + size]
+        meta = {'result_count': len(page)}
+        if page:
+            meta['newest_id'] = page[0]['id']
+            meta['oldest_id'] = page[-1]['id']
+        if offset + size < len(timeline):
+            meta['next_token'] = str(offset + size)
+        body = {'meta': meta}
+        if page:
+            body['data'] = page
+        return web.json_response(body, headers=headers)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/2/users/by/username/{username}', self.user_by_username)
+        app.router.add_get('/2/users/{user_id}/tweets', self.user_tweets)
+        return app
+
+
+def _parse(value):
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a fake Twitter v2 API for offline harvesting')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--users', type=int, default=50, help='Handles member0 .. memberN-1')
+    parser.add_argument('--tweets', type=int, default=250, help='Tweets per handle')
+    parser.add_argument('--limit', type=int, default=60, help='Requests per window per endpoint')
+    parser.add_argument('--window', type=float, default=15.0, help='Rate-limit window in seconds')
+    args = parser.parse_args()
+    api = FakeApi(args.users, args.tweets, args.limit, args.window)
+    web.run_app(api.app(), host='127.0.0.1', port=args.port)
@@ -1,12 +1,18 @@
 import re
+import os
+import json
 import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
-import sys
-
-# Load FinBERT model
-tokenizer = AutoTokenizer.from_pretrained('yiyanghkust/finbert-tone')
-model = AutoModelForSequenceClassification.from_pretrained('yiyanghkust/finbert-tone')
+import argparse
+from sentiment import BACKENDS, cache_key, close_pool
+import score_server
+import dedup
+import incremental
+from annotated import compact, csv_frame, write_annotated
+from score_cache import ScoreCache, DEFAULT_CACHE
+from ticker_matcher import TickerMatcher
+from tweet_store import load_tweets
+import metrics as instrumentation
+from metrics import metrics
 
 # Sentiment thresholds\ nNEG_THRESHOLD = 0.2  # includes tweets with bearish ≥20%
 POS_THRESHOLD = 0.2  # includes tweets with bullish ≥20%
@@ -30,47 +36,166 @@ def load_stock_patterns(stocks_csv):
     return patterns
 
 
-def annotate_and_filter(input_csv, output_csv, stocks_csv):
-    patterns = load_stock_patterns(stocks_csv)
-    df = pd.read_csv(input_csv, parse_dates=['timestamp'])
-    records = []
-
-    for index_row, row in df.iterrows():
-        # Print progress as a percentage
-        percentage = (index_row / len(df)) * 100
-        print(f"Processing: {percentage:.2f}% ({index_row}/{len(df)})", end='\r')
-        text = row.get('text', '')
-        matched = []
-        for ticker, pat in patterns:
-            if pat.search(text):
-                matched.append(ticker)
-        if not matched:
-            continue
+def annotate_chunk(df, matcher, batch_size=32, cache=None, workers=1, backend='torch-fp32', client=None,
+                   dedup_threshold=None):
+    """
+    Ticker-filter, score and sentiment-filter one frame of tweets. With a
+    dedup_threshold, only one tweet per cluster of retweets and near-duplicates
+    is scored and its scores are copied to the rest of the cluster.
+    """
+    # Ticker filtering first in a single pass per text, so only matching tweets reach the model
+    with metrics.timer('match', items=len(df)):
+        matched = matcher.match_column(df['text'])
+    keep = matched != ''
+    metrics.count('rows_read', len(df))
+    metrics.count('rows_ticker_matched', int(keep.sum()))
 
-        # Sentiment scoring
-        inputs = tokenizer(text, return_tensors="pt", truncation=True)
-        logits = model(**inputs).logits
-        scores = torch.softmax(logits, dim=1)[0].tolist()
-        sent_bear, sent_neut, sent_bull = scores
+    # Sentiment scoring in length-bucketed mini-batches
+    out = df[keep.to_numpy()].copy()
+    texts = out['text']
+    if dedup_threshold is not None:
+        with metrics.timer('dedup', items=len(out)):
+            rows = dedup.clusters(out, 'text', 'timestamp', threshold=dedup_threshold)
+        canon, _ = dedup.canonical(rows)
+        texts = texts.iloc[canon]
+        metrics.count('rows_duplicate', len(out) - len(canon))
+    scores = score_server.score_with(client, texts.tolist(), backend=backend, batch_size=batch_size,
+                                     cache=cache, workers=workers)
+    if dedup_threshold is not None:
+        scores = dedup.broadcast(scores, rows)
+        dedup.add_cluster_columns(out, rows)
+    out['sent_bear'] = scores[:, 0]
+    out['sent_neut'] = scores[:, 1]
+    out['sent_bull'] = scores[:, 2]
+    out['matched_tickers'] = matched[keep].to_numpy()
 
-        # Filter out too-neutral tweets\ nif sent_neut >= 0.8:
-        if sent_bear < NEG_THRESHOLD and sent_bull < POS_THRESHOLD:
-            continue
+    # Filter out too-neutral tweets\ nif sent_neut >= 0.8:
+    clear = (out['sent_bear'] >= NEG_THRESHOLD) | (out['sent_bull'] >= POS_THRESHOLD)
+    metrics.count('rows_kept', int(clear.sum()))
+    return out[clear]
 
-        records.append({
-            **row.to_dict(),
-            'sent_bear': sent_bear,
-            'sent_neut': sent_neut,
-            'sent_bull': sent_bull,
-            'matched_tickers': ','.join(set(matched))
-        })
 
-    out = pd.DataFrame(records)
-    out.to_csv(output_csv, index=False)
+def annotate_and_filter(input_csv, output_csv, stocks_csv, batch_size=32, cache=None, workers=1,
+                        backend='torch-fp32', client=None, dedup_threshold=None, incremental_mode=False):
+    """
+    Annotate the whole input into output_csv. In incremental mode only tweets
+    past the output's watermark are annotated and upserted into it by id.
+    """
+    matcher = TickerMatcher.from_csv(stocks_csv)
+    df = load_tweets(input_csv, parse_dates=['timestamp'])
+    if incremental_mode:
+        df = df[incremental.after_watermark(df, incremental.get_watermark(output_csv), 'id', 'timestamp')]
+        print(f"{len(df)} tweets past the watermark of {output_csv}")
+    out = annotate_chunk(df, matcher, batch_size=batch_size, cache=cache, workers=workers,
+                         backend=backend, client=client, dedup_threshold=dedup_threshold)
+    size_before = os.path.getsize(output_csv) if incremental_mode and os.path.exists(output_csv) else 0
+    with metrics.timer('write'):
+        if incremental_mode:
+            incremental.upsert_csv(output_csv, csv_frame(*compact(out)))
+        else:
+            write_annotated(*compact(out), output_csv)
+    metrics.count('bytes_written', max(os.path.getsize(output_csv) - size_before, 0))
+    incremental.set_watermark(output_csv, df, 'id', 'timestamp', reset=not incremental_mode)
     print(f"Filtered and annotated {len(out)} tweets with clear positive/negative sentiment to {output_csv}")
+    if cache is not None:
+        print(cache.stats())
+
+
+def _write_checkpoint(path, rows_done, output_bytes):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'rows_done': rows_done, 'output_bytes': output_bytes}, f)
+    os.replace(tmp, path)
+
+
+def annotate_streaming(input_csv, output_csv, stocks_csv, chunksize=10000, batch_size=32, cache=None,
+                       workers=1, backend='torch-fp32', client=None, dedup_threshold=None):
+    """
+    Annotate the input in chunks, appending each chunk's results to output_csv.
+    After every chunk the input rows consumed and the output size are saved to
+    <output_csv>.ckpt; a restarted run truncates the output to that size and
+    skips the rows already done. The checkpoint is removed once the run finishes.
+    Duplicates are only collapsed within a chunk; the score cache covers exact
+    repeats across chunks.
+    """
+    matcher = TickerMatcher.from_csv(stocks_csv)
+    ckpt_path = output_csv + '.ckpt'
+    rows_done, output_bytes = 0, 0
+    if os.path.exists(ckpt_path):
+        with open(ckpt_path) as f:
+            ckpt = json.load(f)
+        rows_done, output_bytes = ckpt['rows_done'], ckpt['output_bytes']
+        print(f"Resuming after {rows_done} input rows")
+    # Drop anything written after the last checkpoint (or a stale output from an earlier run)
+    with open(output_csv, 'ab') as f:
+        f.truncate(output_bytes)
+
+    rows_seen = 0
+    written = 0
+    for chunk in pd.read_csv(input_csv, parse_dates=['timestamp'], chunksize=chunksize):
+        # Chunks are re-parsed on resume because quoted tweets can span lines
+        if rows_seen + len(chunk) <= rows_done:
+            rows_seen += len(chunk)
+            continue
+        chunk = chunk.iloc[max(rows_done - rows_seen, 0):]
+        rows_seen = rows_done = rows_done + len(chunk)
+
+        out = annotate_chunk(chunk, matcher, batch_size=batch_size, cache=cache, workers=workers,
+                             backend=backend, client=client, dedup_threshold=dedup_threshold)
+        if not out.empty:
+            with open(output_csv, 'a', newline='', encoding='utf-8') as f:
+                csv_frame(*compact(out)).to_csv(f, header=output_bytes == 0, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+                metrics.count('bytes_written', f.tell() - output_bytes)
+                output_bytes = f.tell()
+            written += len(out)
+        _write_checkpoint(ckpt_path, rows_done, output_bytes)
+        print(f"Processed {rows_done} rows, {written} annotated tweets written this run", end='\r')
+
+    # Every chunk ran on the same worker pool; release it now the model is no longer needed
+    close_pool()
+    if os.path.exists(ckpt_path):
+        os.remove(ckpt_path)
+    print(f"\nFiltered and annotated {written} tweets with clear positive/negative sentiment to {output_csv}")
+    if cache is not None:
+        print(cache.stats())
 
 if __name__ == '__main__':
-    if len(sys.argv)!=4:
-        print('Usage: python annotate_stocks_filtered.py <input_csv> <output_csv> <stocks_csv>')
-        sys.exit(1)
-    annotate_and_filter(sys.argv[1], sys.argv[2], sys.argv[3])
+    parser = argparse.ArgumentParser(description='Annotate stock-related tweets with FinBERT sentiment')
+    parser.add_argument('input_csv', help="Tweets CSV, or store:<source>[:<start>[:<end>]] for the tweet store")
+    parser.add_argument('output_csv', help='CSV, or Parquet plus a .tickers.parquet ticker table')
+    parser.add_argument('stocks_csv')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=1, help='Scoring processes sharing one model')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch-fp32', help='FinBERT inference backend')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='SQLite score cache path')
+    parser.add_argument('--no-cache', action='store_true', help='Rescore every tweet')
+    parser.add_argument('--chunksize', type=int,
+                        help='Stream the input in chunks of this many rows, with resumable checkpoints')
+    parser.add_argument('--dedup', type=float, nargs='?', const=dedup.THRESHOLD, metavar='THRESHOLD',
+                        help='Score one tweet per cluster of retweets and near-duplicates')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only annotate tweets past the watermark in cache/watermarks.json and upsert them by id')
+    score_server.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    if args.chunksize and args.input_csv.startswith('store:'):
+        parser.error('--chunksize streams CSV input; read store slices without it')
+    if args.chunksize and args.incremental:
+        parser.error('--incremental reads only the new tweets; use it without --chunksize')
+    if (args.chunksize or args.incremental) and args.output_csv.endswith('.parquet'):
+        parser.error('--chunksize and --incremental append to a CSV output')
+    cache = None if args.no_cache else ScoreCache(args.cache)
+    client = None if args.no_server else score_server.connect(args.server, cache_key(backend=args.backend))
+    with instrumentation.instrumented(args, 'general_annotate'):
+        if args.chunksize:
+            annotate_streaming(args.input_csv, args.output_csv, args.stocks_csv, chunksize=args.chunksize,
+                               batch_size=args.batch_size, cache=cache, workers=args.workers,
+                               backend=args.backend, client=client, dedup_threshold=args.dedup)
+        else:
+            annotate_and_filter(args.input_csv, args.output_csv, args.stocks_csv,
+                                batch_size=args.batch_size, cache=cache, workers=args.workers,
+                                backend=args.backend, client=client, dedup_threshold=args.dedup,
+                                incremental_mode=args.incremental)
+    print(metrics.report())
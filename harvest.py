@@ -3,10 +3,10 @@ import argparse
 import sys
 import time
 from datetime import datetime, timedelta, timezone
+import functools
 import pandas as pd
-import tweepy
-import yfinance as yf
 from dotenv import load_dotenv
+from price_store import PriceStore
 
 # Load environment variables from .env file
 dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
@@ -21,14 +21,16 @@ def get_env_var(name):
         sys.exit(1)
     return val
 
-# Initialize Tweepy Client (v2) with rate-limit backoff
-def init_client():
+# Initialize Tweepy Client (v2) with rate-limit backoff, on first use so that
+# --help and imports of this module need neither tweepy nor credentials
+@functools.lru_cache(maxsize=None)
+def get_client():
+    import tweepy
     bearer_token = get_env_var('TW_BEARER_TOKEN')
     return tweepy.Client(
         bearer_token=bearer_token,
         wait_on_rate_limit=False  # we'll handle backoff manually
     )
-client = init_client()
 
 # Rate-limit backoff helper
 def backoff_sleep(response):
@@ -40,6 +42,8 @@ def backoff_sleep(response):
 
 # Get user ID for a handle, with backoff
 def get_user_id(handle):
+    import tweepy
+    client = get_client()
     while True:
         try:
             resp = client.get_user(username=handle.lstrip('@'))
@@ -52,6 +56,8 @@ def get_user_id(handle):
 
 # Fetch tweets via v2 endpoint and filter by date, with basic rate-limit backoff
 def fetch_tweets(usernames, start, end, output_csv):
+    import tweepy
+    client = get_client()
     records = []
     start_iso = start.replace(tzinfo=timezone.utc).isoformat()
     end_iso = end.replace(tzinfo=timezone.utc).isoformat()
@@ -75,14 +81,9 @@ def fetch_tweets(usernames, start, end, output_csv):
                     })
     pd.DataFrame(records).to_csv(output_csv, index=False)
 
-# Fetch historical price bars via yfinance
+# Fetch historical price bars through the local price store
 def fetch_price_bars(ticker, start, end, interval, output_csv):
-    df = yf.download(
-        ticker,
-        start=start.strftime('%Y-%m-%d'),
-        end=end.strftime('%Y-%m-%d'),
-        interval=interval
-    )
+    df = PriceStore().get_bars(ticker, start, end, interval)
     df.to_csv(output_csv)
 
 # Main entry point
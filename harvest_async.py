@@ -0,0 +1,220 @@
+import os
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from datetime import datetime, timezone
+import aiohttp
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+dotenv_path = os.path.join(os.path.dirname(__file__), '.env')
+load_dotenv(dotenv_path=dotenv_path)
+
+API_BASE = 'https://api.twitter.com'
+FIELDNAMES = ['user', 'id', 'created_at', 'text']
+
+
+class RateLimiter:
+    """
+    Request budget for one endpoint, shared by every handle being harvested.
+    The budget comes from the x-rate-limit-remaining/reset headers; once it is
+    used up, requests wait for the reset instead of running into 429s.
+    """
+
+    def __init__(self, reserve=0):
+        self.remaining = None
+        self.reset = 0.0
+        self.reserve = reserve
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            if self.remaining is not None and self.remaining <= self.reserve:
+                wait = self.reset - time.time() + 1
+                if wait > 0:
+                    sys.stderr.write(f"Rate budget used up, pausing {wait:.0f} seconds...\n")
+                    await asyncio.sleep(wait)
+                self.remaining = None
+            if self.remaining is not None:
+                self.remaining -= 1
+
+    def update(self, headers):
+        if 'x-rate-limit-remaining' in headers:
+            self.remaining = int(headers['x-rate-limit-remaining'])
+        if 'x-rate-limit-reset' in headers:
+            self.reset = float(headers['x-rate-limit-reset'])
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def load_ids(path):
+    """Tweet ids already in the output CSV."""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return set()
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['id'] for row in csv.DictReader(f) if row.get('id')}
+
+
+async def api_get(session, api_base, path, params, limiter):
+    """GET a v2 endpoint, throttled by the shared limiter and retried after 429s."""
+    while True:
+        await limiter.acquire()
+        async with session.get(api_base + path, params=params) as resp:
+            limiter.update(resp.headers)
+            if resp.status == 429:
+                limiter.remaining = 0
+                reset = float(resp.headers.get('x-rate-limit-reset', time.time() + 60))
+                limiter.reset = max(reset, time.time() + 5)
+                continue
+            resp.raise_for_status()
+            return await resp.json()
+
+
+async def harvest_handle(session, api_base, handle, state, limiters, write_rows, persist, start_iso, end_iso):
+    """
+    Page through one handle's timeline, writing each page as it arrives.
+    The pagination token is saved after every page and since_id after the last,
+    so an interrupted run resumes mid-timeline and the next run only fetches newer tweets.
+    """
+    entry = state.setdefault(handle, {})
+    if 'user_id' not in entry:
+        body = await api_get(session, api_base, f"/2/users/by/username/{handle.lstrip('@')}", {},
+                             limiters['users'])
+        if not body.get('data'):
+            raise RuntimeError(f"Unable to fetch user ID for {handle}")
+        entry['user_id'] = body['data']['id']
+        persist()
+
+    # Resume with the query the interrupted run was paging through
+    query = entry.get('query')
+    if query is None:
+        query = {'max_results': 100, 'tweet.fields': 'created_at,text'}
+        if entry.get('since_id'):
+            query['since_id'] = entry['since_id']
+        elif start_iso:
+            query['start_time'] = start_iso
+        if end_iso:
+            query['end_time'] = end_iso
+        entry['query'] = query
+    token = entry.get('pagination_token')
+    newest = entry.get('pending_newest_id')
+
+    pages = tweets = 0
+    while True:
+        params = dict(query, pagination_token=token) if token else query
+        body = await api_get(session, api_base, f"/2/users/{entry['user_id']}/tweets", params,
+                             limiters['tweets'])
+        meta = body.get('meta', {})
+        newest = newest or meta.get('newest_id')
+        rows = [{'user': handle, 'id': t['id'], 'created_at': t.get('created_at'), 'text': t.get('text')}
+                for t in body.get('data', [])]
+        write_rows(rows)
+        pages += 1
+        tweets += len(rows)
+        token = meta.get('next_token')
+        entry['pagination_token'] = token
+        entry['pending_newest_id'] = newest
+        persist()
+        if not token:
+            break
+
+    if newest:
+        entry['since_id'] = newest
+    for key in ('query', 'pagination_token', 'pending_newest_id'):
+        entry.pop(key, None)
+    persist()
+    print(f"{handle}: {tweets} tweets in {pages} pages")
+
+
+async def harvest(usernames, output_csv, state_path, start=None, end=None, concurrency=8,
+                  api_base=API_BASE, bearer_token=None):
+    """Harvest several handles concurrently under shared per-endpoint rate-limit budgets."""
+    state = load_state(state_path)
+    start_iso = start.replace(tzinfo=timezone.utc).isoformat() if start else None
+    end_iso = end.replace(tzinfo=timezone.utc).isoformat() if end else None
+    limiters = {'users': RateLimiter(), 'tweets': RateLimiter()}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    new_file = not os.path.exists(output_csv) or os.path.getsize(output_csv) == 0
+    seen = load_ids(output_csv)
+    with open(output_csv, 'a', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        if new_file:
+            writer.writeheader()
+
+        # Rows are flushed before the state is saved, so a crash can only repeat a page, never lose one;
+        # a repeated page's tweets are already in seen and are skipped
+        def write_rows(rows):
+            rows = [r for r in rows if r['id'] not in seen]
+            seen.update(r['id'] for r in rows)
+            writer.writerows(rows)
+            f.flush()
+
+        def persist():
+            save_state(state_path, state)
+
+        async def run(handle):
+            async with semaphore:
+                try:
+                    await harvest_handle(session, api_base, handle, state, limiters, write_rows, persist,
+                                         start_iso, end_iso)
+                except (aiohttp.ClientError, RuntimeError) as e:
+                    sys.stderr.write(f"{handle}: {e}\n")
+
+        headers = {'Authorization': f'Bearer {bearer_token}'} if bearer_token else {}
+        async with aiohttp.ClientSession(headers=headers) as session:
+            await asyncio.gather(*(run(h) for h in usernames))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Harvest timelines for many handles concurrently.")
+    parser.add_argument('--users', nargs='+', help="Twitter handles (e.g. @POTUS)")
+    parser.add_argument('--users-file', help="File with one handle per line")
+    parser.add_argument('--start', help="Start date YYYY-MM-DD (ignored once a handle has a since_id)")
+    parser.add_argument('--end', help="End date YYYY-MM-DD")
+    parser.add_argument('--output', default='harvested_tweets.csv')
+    parser.add_argument('--state', default='harvest_state.json',
+                        help="Per-handle since_id and pagination tokens")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--api-base', default=os.getenv('TW_API_BASE', API_BASE),
+                        help="API root, e.g. http://127.0.0.1:8080 for fake_twitter_api.py")
+    args = parser.parse_args()
+
+    usernames = list(args.users or [])
+    if args.users_file:
+        with open(args.users_file) as f:
+            usernames += [line.strip() for line in f if line.strip()]
+    if not usernames:
+        parser.error('give --users or --users-file')
+    try:
+        start = datetime.fromisoformat(args.start) if args.start else None
+        end = datetime.fromisoformat(args.end) if args.end else None
+    except ValueError:
+        sys.stderr.write("Error: --start/--end must be YYYY-MM-DD\n")
+        sys.exit(1)
+
+    bearer_token = os.getenv('TW_BEARER_TOKEN')
+    if not bearer_token and args.api_base == API_BASE:
+        sys.stderr.write("Error: environment variable TW_BEARER_TOKEN is not set.\n")
+        sys.exit(1)
+    asyncio.run(harvest(usernames, args.output, args.state, start, end, args.concurrency,
+                        args.api_base, bearer_token))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from trading_calendar import get_calendar
+
+DEFAULT_WATERMARKS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'watermarks.json')
+
+
+def load_watermarks(path=DEFAULT_WATERMARKS):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {}
+
+
+def save_watermarks(marks, path=DEFAULT_WATERMARKS):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(marks, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def get_watermark(output, path=DEFAULT_WATERMARKS):
+    """{'max_id', 'max_time'} of the input rows already folded into output, or None before the first run."""
+    if not os.path.exists(output):
+        # A deleted output starts over, whatever the watermark says
+        return None
+    return load_watermarks(path).get(os.path.abspath(output))
+
+
+def set_watermark(output, frame, id_col='id', time_col=None, reset=False, path=DEFAULT_WATERMARKS):
+    """
+    Advance output's watermark past every row of frame, or with reset (after a
+    full rebuild) set it to frame's rows alone. Call only once output is written.
+    """
+    marks = load_watermarks(path)
+    mark = {} if reset else dict(marks.get(os.path.abspath(output)) or {})
+    ids = pd.to_numeric(frame[id_col], errors='coerce').dropna()
+    if len(ids):
+        mark['max_id'] = max(int(ids.max()), mark.get('max_id', int(ids.max())))
+    if time_col is not None:
+        times = pd.to_datetime(frame[time_col], utc=True, errors='coerce', format='mixed').dropna()
+        if len(times):
+            latest = times.max()
+            if mark.get('max_time'):
+                latest = max(latest, pd.Timestamp(mark['max_time']))
+            mark['max_time'] = latest.isoformat()
+    marks[os.path.abspath(output)] = mark
+    save_watermarks(marks, path)
+
+
+def after_watermark(frame, mark, id_col='id', time_col=None):
+    """Boolean mask of the rows newer than the watermark: a larger id or a later time."""
+    if not mark:
+        return np.ones(len(frame), dtype=bool)
+    new = np.zeros(len(frame), dtype=bool)
+    if 'max_id' in mark:
+        ids = pd.to_numeric(frame[id_col], errors='coerce')
+        new |= (ids > mark['max_id']).to_numpy(dtype=bool, na_value=False)
+    if time_col is not None and mark.get('max_time'):
+        times = pd.to_datetime(frame[time_col], utc=True, errors='coerce', format='mixed')
+        new |= (times > pd.Timestamp(mark['max_time'])).to_numpy(dtype=bool, na_value=False)
+    return new
+
+
+def upsert(existing, new, id_col='id'):
+    """existing with the rows whose id is in new replaced by new's rows, and new ids appended."""
+    if existing is None or existing.empty:
+        return new.reset_index(drop=True)
+    kept = existing[~existing[id_col].isin(new[id_col])]
+    return pd.concat([kept, new], ignore_index=True)
+
+
+def upsert_csv(path, new, id_col='id'):
+    """
+    Upsert new into the CSV at path by id. When none of the ids are stored yet
+    and the columns match, the rows are appended and only the id column and
+    header are read; otherwise the file is rewritten through a temporary copy.
+    """
+    if not os.path.exists(path):
+        new.to_csv(path, index=False)
+        return len(new)
+    header = list(pd.read_csv(path, nrows=0).columns)
+    stored = pd.read_csv(path, usecols=[id_col])[id_col]
+    if header == list(new.columns) and not new[id_col].isin(stored).any():
+        new.to_csv(path, mode='a', header=False, index=False)
+        return len(stored) + len(new)
+    merged = upsert(pd.read_csv(path), new, id_col)
+    tmp = path + '.tmp'
+    merged.to_csv(tmp, index=False)
+    os.replace(tmp, path)
+    return len(merged)
+
+
+def window_closed(event_times, window, dates=None, now=None, calendar=None):
+    """
+    Whether each event's window (first, last) in sessions around its event
+    session is final: its last session has closed by now and, when dates (the
+    days with prices) are given, every session of the window has a price.
+    A late or missing bar keeps the window open, so it is computed again.
+    """
+    cal = calendar or get_calendar()
+    now = pd.Timestamp.now(tz='UTC') if now is None else pd.Timestamp(now)
+    sessions = cal.event_sessions(event_times)
+    starts = cal.offset(sessions, window[0])
+    ends = cal.offset(sessions, window[1])
+    closed = np.zeros(len(ends), dtype=bool)
+    ok = (starts >= 0) & (ends >= 0)
+    closed[ok] = cal.session_close(ends[ok]) <= now
+    if dates is not None:
+        positions = cal.session_positions(pd.DatetimeIndex(dates))
+        priced = np.zeros(len(cal) + 1, dtype=np.int64)
+        priced[positions[positions >= 0] + 1] = 1
+        priced = np.cumsum(priced)
+        closed[ok] &= priced[ends[ok] + 1] - priced[starts[ok]] == ends[ok] - starts[ok] + 1
+    return closed
@@ -0,0 +1,185 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from price_store import PriceStore, csv_fetcher
+from trading_calendar import get_calendar
+from annotated import exploded, split_tickers, ticker_csr
+import metrics as instrumentation
+from metrics import metrics
+
+HORIZONS = [1, 5, 15, 30, 60]  # minutes after the tweet
+MARKET = 'SPY'
+
+
+def price_path(bars, interval='1m'):
+    """
+    As-of price path of intraday bars as (times, prices) in UTC nanoseconds:
+    the first bar's open at its start, then every bar's close at its end.
+    """
+    if bars.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    step = pd.Timedelta(interval.replace('m', 'min')).value
+    starts = bars.index.as_unit('ns').asi8
+    times = np.concatenate([starts[:1], starts + step])
+    prices = np.concatenate([bars['Open'].to_numpy(dtype=np.float64)[:1], bars['Close'].to_numpy(dtype=np.float64)])
+    return times, prices
+
+
+def asof(times, prices, t):
+    """Last price at or before each time in t (any shape), NaN before the first one."""
+    idx = np.searchsorted(times, t, side='right') - 1
+    return np.where(idx >= 0, prices[np.clip(idx, 0, None)], np.nan) if len(times) else np.full(np.shape(t), np.nan)
+
+
+def horizon_returns(path, event_ns, horizons_ns, close_ns):
+    """(n, H) returns from each event time to event + horizon; NaN when the horizon passes the close."""
+    ends = event_ns[:, None] + horizons_ns[None, :]
+    start_price = asof(*path, event_ns)[:, None]
+    rets = asof(*path, ends) / start_price - 1
+    return np.where(ends <= close_ns[:, None], rets, np.nan)
+
+
+class Summary:
+    """Running count/sum/sum of squares per column, so days can be aggregated as they stream by."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n = np.zeros(len(self.columns))
+        self.sum = np.zeros(len(self.columns))
+        self.sumsq = np.zeros(len(self.columns))
+
+    def add(self, frame):
+        values = frame[self.columns].to_numpy(dtype=np.float64)
+        ok = ~np.isnan(values)
+        self.n += ok.sum(axis=0)
+        self.sum += np.where(ok, values, 0).sum(axis=0)
+        self.sumsq += np.where(ok, values * values, 0).sum(axis=0)
+
+    def frame(self):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = self.sum / self.n
+            std = np.sqrt((self.sumsq - self.n * mean ** 2) / (self.n - 1))
+            t = mean / (std / np.sqrt(self.n))
+        return pd.DataFrame({'n': self.n.astype(np.int64), 'mean': mean, 'std': std, 't_stat': t},
+                            index=pd.Index(self.columns, name='column'))
+
+
+def event_pairs(tweets, time_col, ticker=None, ticker_col=None, id_col='id'):
+    """One row per (tweet, ticker): id, UTC time and ticker."""
+    times = pd.to_datetime(tweets[time_col], utc=True, errors='coerce', format='mixed')
+    if ticker_col is None:
+        return pd.DataFrame({'id': tweets[id_col].to_numpy(), 'time': times.to_numpy(), 'ticker': ticker})
+    pairs = exploded(ticker_csr(split_tickers(tweets[ticker_col])))
+    rows = pairs['row'].to_numpy()
+    return pd.DataFrame({'id': tweets[id_col].to_numpy()[rows], 'time': times.to_numpy()[rows],
+                         'ticker': pairs['ticker'].astype(str).to_numpy()})
+
+
+def day_ranges(days, join=pd.Timedelta(days=7)):
+    """
+    Whole-day [start, end) ranges covering the given days. Days less than join
+    apart share a range, so nearby sessions are fetched in one request.
+    """
+    ranges = []
+    for day in pd.DatetimeIndex(days).unique().sort_values():
+        if ranges and day - ranges[-1][1] < join:
+            ranges[-1][1] = day + pd.Timedelta(days=1)
+        else:
+            ranges.append([day, day + pd.Timedelta(days=1)])
+    return ranges
+
+
+def iter_days(events, store, horizons=HORIZONS, market=MARKET, interval='1m', calendar=None):
+    """
+    Yield one frame of intraday returns per trading session, in session order.
+    Tweets outside regular hours start at the next session's open. Only one
+    session's bars are read at a time, so years of minute data never have to
+    be in memory together. Abnormal returns are market-adjusted (ticker minus
+    market over the same minutes).
+    """
+    cal = calendar or get_calendar()
+    horizons_ns = np.asarray([pd.Timedelta(minutes=h).value for h in horizons], dtype=np.int64)
+    events = events.assign(session=cal.event_sessions(events['time']))
+    events = events[events['session'] >= 0].sort_values(['session', 'time'], kind='stable')
+    opens = cal.opens.asi8
+    closes = cal.closes.asi8
+    if events.empty:
+        return
+
+    # Fill each ticker's missing bars up front, only around the sessions it has events on
+    # (the market on every event session); the day loop then only does range reads
+    dates = cal.sessions[events['session'].to_numpy()]
+    tickers = events['ticker'].to_numpy()
+    for ticker in [market] + [t for t in pd.unique(tickers) if t != market]:
+        days = dates if ticker == market else dates[tickers == ticker]
+        with metrics.timer('intraday_fetch'):
+            store.ensure_ranges(ticker, day_ranges(days), interval)
+
+    for session, day in events.groupby('session', sort=True):
+        date = cal.sessions[session]
+        time_ns = pd.DatetimeIndex(day['time']).as_unit('ns').asi8
+        event_ns = np.maximum(time_ns, opens[session])
+        close_ns = np.full(len(day), closes[session])
+        with metrics.timer('intraday_bars'):
+            market_path = price_path(store.get_bars(market, date, date + pd.Timedelta(days=1), interval), interval)
+        market_rets = horizon_returns(market_path, event_ns, horizons_ns, close_ns)
+
+        rets = np.full((len(day), len(horizons)), np.nan)
+        tickers = day['ticker'].to_numpy()
+        for ticker in pd.unique(tickers):
+            mask = tickers == ticker
+            with metrics.timer('intraday_bars'):
+                bars = store.get_bars(ticker, date, date + pd.Timedelta(days=1), interval)
+            rets[mask] = horizon_returns(price_path(bars, interval), event_ns[mask], horizons_ns, close_ns[mask])
+
+        out = day[['id', 'ticker', 'time']].reset_index(drop=True)
+        out['event_time'] = pd.to_datetime(event_ns, utc=True)
+        out['session'] = date
+        for j, h in enumerate(horizons):
+            out[f'ret_{h}m'] = rets[:, j]
+            out[f'mkt_{h}m'] = market_rets[:, j]
+            out[f'ar_{h}m'] = rets[:, j] - market_rets[:, j]
+        metrics.count('intraday_sessions')
+        metrics.count('intraday_events', len(out))
+        yield out
+
+
+def run_study(events, store, output_csv, horizons=HORIZONS, market=MARKET, interval='1m'):
+    """Stream every session's returns to output_csv and return the running summary per horizon."""
+    summary = None
+    if os.path.exists(output_csv):
+        os.remove(output_csv)
+    for day in iter_days(events, store, horizons, market, interval):
+        if summary is None:
+            summary = Summary([c for c in day.columns if c.startswith(('ret_', 'mkt_', 'ar_'))])
+        summary.add(day)
+        day.to_csv(output_csv, mode='a', header=not os.path.exists(output_csv), index=False)
+    return summary.frame() if summary is not None else pd.DataFrame()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Intraday abnormal returns minutes after each tweet')
+    parser.add_argument('input_csv', help='Annotated tweets CSV')
+    parser.add_argument('--time-col', default='createdAt')
+    parser.add_argument('--id-col', default='id')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--ticker', default='TSLA', help='Ticker for every tweet')
+    group.add_argument('--ticker-col', help="Per-tweet tickers column, e.g. 'matched_tickers'")
+    parser.add_argument('--horizons', type=int, nargs='+', default=HORIZONS, help='Minutes after the tweet')
+    parser.add_argument('--market', default=MARKET)
+    parser.add_argument('--interval', default='1m', choices=['1m', '2m', '5m'])
+    parser.add_argument('--bars-dir', help='Serve missing bars from <dir>/<ticker>_<interval>.csv instead of Yahoo')
+    parser.add_argument('--output', default='intraday_results.csv')
+    parser.add_argument('--summary', default='intraday_summary.csv')
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+
+    store = PriceStore(fetcher=csv_fetcher(args.bars_dir)) if args.bars_dir else PriceStore()
+    with instrumentation.instrumented(args, 'intraday_study'):
+        tweets = pd.read_csv(args.input_csv)
+        events = event_pairs(tweets, args.time_col, args.ticker, args.ticker_col, args.id_col)
+        summary = run_study(events, store, args.output, args.horizons, args.market, args.interval)
+    summary.to_csv(args.summary)
+    print(summary.loc[[c for c in summary.index if c.startswith('ar_')]].to_string())
+    print(f"Saved per-event returns to {args.output} and the summary to {args.summary}")
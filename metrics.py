@@ -0,0 +1,153 @@
+import contextlib
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import numpy as np
+
+
+class Metrics:
+    """
+    Process-wide counters and timers.
+    Counters are plain sums (rows read, cache hits, bytes written, ...); timers
+    keep every duration so p50/p99 can be reported, plus an optional item
+    count per observation (e.g. tokens per batch) for throughput.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.durations = {}
+        self.items = {}
+        self.started = time.time()
+
+    def count(self, name, n=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, seconds, items=0):
+        with self.lock:
+            self.durations.setdefault(name, []).append(seconds)
+            self.items[name] = self.items.get(name, 0) + items
+
+    @contextlib.contextmanager
+    def timer(self, name, items=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, items)
+
+    def summary(self):
+        """Counters plus count/total/p50/p99 (and items/s where items were recorded) per timer."""
+        timers = {}
+        for name, values in self.durations.items():
+            d = np.asarray(values)
+            entry = {'count': len(d), 'total_s': float(d.sum()), 'p50_s': float(np.percentile(d, 50)),
+                     'p99_s': float(np.percentile(d, 99)), 'max_s': float(d.max())}
+            if self.items.get(name):
+                entry['items'] = self.items[name]
+                entry['items_per_s'] = self.items[name] / d.sum() if d.sum() > 0 else None
+            timers[name] = entry
+        return {'counters': dict(self.counters), 'timers': timers,
+                'wall_s': time.time() - self.started}
+
+    def prometheus(self, prefix='brp_'):
+        """Prometheus text exposition: counters as *_total, timers as summaries."""
+        s = self.summary()
+        lines = [f"# TYPE {prefix}wall_seconds gauge", f"{prefix}wall_seconds {s['wall_s']:.6f}"]
+        for name, value in sorted(s['counters'].items()):
+            lines += [f"# TYPE {prefix}{name}_total counter", f"{prefix}{name}_total {value}"]
+        for name, t in sorted(s['timers'].items()):
+            metric = f"{prefix}{name}_seconds"
+            lines += [f"# TYPE {metric} summary",
+                      f'{metric}{{quantile="0.5"}} {t["p50_s"]:.6f}',
+                      f'{metric}{{quantile="0.99"}} {t["p99_s"]:.6f}',
+                      f"{metric}_sum {t['total_s']:.6f}",
+                      f"{metric}_count {t['count']}"]
+            if 'items' in t:
+                lines += [f"# TYPE {prefix}{name}_items_total counter", f"{prefix}{name}_items_total {t['items']}"]
+        return '\n'.join(lines) + '\n'
+
+    def export(self, path, job=None):
+        """Append one JSON line per run, or write Prometheus text when the path ends in .prom."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if path.endswith('.prom'):
+            with open(path, 'w') as f:
+                f.write(self.prometheus())
+            return
+        record = {'job': job or os.path.basename(sys.argv[0]), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  **self.summary()}
+        with open(path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+
+    def report(self):
+        """Short human-readable summary for the end of a run."""
+        s = self.summary()
+        lines = [f"{name}: {value:,}" for name, value in sorted(s['counters'].items())]
+        for name, t in sorted(s['timers'].items()):
+            line = (f"{name}: {t['count']} x, total {t['total_s']:.3f}s, "
+                    f"p50 {t['p50_s'] * 1000:.1f}ms, p99 {t['p99_s'] * 1000:.1f}ms")
+            if t.get('items_per_s'):
+                line += f", {t['items_per_s']:,.0f}/s"
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+# Shared registry used by every module
+metrics = Metrics()
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """
+    Profile the enclosed block. Uses pyinstrument when installed (HTML report),
+    otherwise cProfile: a .pstats dump plus a text listing of the top functions.
+    """
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        Profiler = None
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w') as f:
+                f.write(profiler.output_html() if path.endswith('.html') else profiler.output_text())
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path + '.pstats' if not path.endswith('.pstats') else path)
+        with open(path if not path.endswith('.pstats') else path[:-7] + '.txt', 'w') as f:
+            pstats.Stats(profiler, stream=f).sort_stats('cumulative').print_stats(40)
+
+
+def add_arguments(parser):
+    parser.add_argument('--metrics', help='Append run metrics to this JSON-lines file (.prom for Prometheus text)')
+    parser.add_argument('--profile', help='Write a cProfile (or pyinstrument, if installed) report to this path')
+
+
+@contextlib.contextmanager
+def instrumented(args, job=None):
+    """Run a script body under the --profile/--metrics options from add_arguments."""
+    try:
+        with profiled(args.profile) if args.profile else contextlib.nullcontext():
+            yield metrics
+    finally:
+        # Metrics of a failed run are still written, up to the step that failed
+        if args.metrics:
+            metrics.export(args.metrics, job)
+            print(f"Metrics written to {args.metrics}")
@@ -1,25 +1,36 @@
+import os
+import sys
 import pandas as pd
-import yfinance as yf
-import matplotlib.pyplot as plt
 import argparse
 
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from price_store import PriceStore
+from trading_calendar import get_calendar
+
 
 def main(tweets_file, year):
-    tweets = pd.read_csv(tweets_file, parse_dates=['createdAt'])
-    first_date = tweets['createdAt'].dt.date.min()
-    last_date  = tweets['createdAt'].dt.date.max()
-    start_date = pd.to_datetime(first_date) - pd.Timedelta(days=3)
-    end_date   = pd.to_datetime(last_date) + pd.Timedelta(days=3)
-    tsla_daily = yf.download(
+    import matplotlib.pyplot as plt
+    tweets = pd.read_csv(tweets_file)
+    tweets['createdAt'] = pd.to_datetime(tweets['createdAt'], utc=True, format='mixed')
+    # Each tweet's effective trading day: after-close, weekend and holiday tweets roll forward
+    calendar = get_calendar()
+    tweets['session'] = calendar.event_sessions(tweets['createdAt'])
+    tweets = tweets[tweets['session'] >= 0].copy()
+    tweets['event_day'] = calendar.session_dates(tweets['session'])
+    start_date = calendar.session_dates(calendar.offset([tweets['session'].min()], -3))[0]
+    end_date = calendar.session_dates(calendar.offset([tweets['session'].max()], 3))[0]
+    store = PriceStore()
+    tsla_daily = store.get_bars(
         'TSLA',
-        start=start_date.strftime('%Y-%m-%d'),
-        end=(end_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
+        start_date.strftime('%Y-%m-%d'),
+        (end_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
         interval='1d'
-    )
+    ).copy()
     plt.figure(figsize=(10, 6))
     plt.plot(tsla_daily.index, tsla_daily['Close'], label='TSLA Close')
-    for ts in tweets['createdAt']:
-        plt.axvline(ts, color='red', linestyle='--', alpha=0.5)
+    for day in tweets['event_day'].unique():
+        plt.axvline(day, color='red', linestyle='--', alpha=0.5)
     plt.title(f'TSLA Daily Close vs Tesla-related Musk Tweets ({year})')
     plt.xlabel('Date')
     plt.ylabel('Price (USD)')
@@ -29,13 +40,12 @@ def main(tweets_file, year):
     print(f"Saved daily_{year}_tesla_tweets.png")
 
     tsla_daily['Return'] = tsla_daily['Close'].pct_change()
-    tweet_days = tweets['createdAt'].dt.floor('D')
-    impact = {day: tsla_daily.loc[day, 'Return']
-              for day in tweet_days.unique() if day in tsla_daily.index}
-    if impact:
-        impact_date = max(impact, key=lambda d: abs(impact[d]))
+    # Daily bars have a naive session-date index, the same as the event days
+    impact = tsla_daily['Return'].reindex(pd.DatetimeIndex(tweets['event_day'].unique())).dropna()
+    if not impact.empty:
+        impact_date = impact.abs().idxmax()
         print(f'Most impactful Tesla tweet date: {impact_date.date()} with return {impact[impact_date]:.2%}')
-        intraday = yf.download(
+        intraday = store.get_bars(
             'TSLA',
             start=impact_date.strftime('%Y-%m-%d'),
             end=(impact_date + pd.Timedelta(days=1)).strftime('%Y-%m-%d'),
@@ -43,8 +53,11 @@ def main(tweets_file, year):
         )
         plt.figure(figsize=(10, 6))
         plt.plot(intraday.index, intraday['Close'], label='TSLA 5-min')
-        plt.axvline(impact_date + pd.Timedelta(hours=16, minutes=48),
-                    color='red', linestyle='--', alpha=0.7)
+        # Intraday bars are UTC; tweets from before the open are drawn at the open
+        session = calendar.session_positions([impact_date])
+        session_open = calendar.session_open(session)[0]
+        for ts in tweets.loc[tweets['event_day'] == impact_date, 'createdAt']:
+            plt.axvline(max(ts, session_open), color='red', linestyle='--', alpha=0.7)
         plt.title(f'TSLA Intraday on {impact_date.date()} (Tesla-related tweet)')
         plt.xlabel('Time')
         plt.ylabel('Price (USD)')
@@ -1,11 +1,19 @@
+import argparse
+import os
 import re
-import pandas as pd
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import sys
 
-# Load FinBERT model
-tokenizer = AutoTokenizer.from_pretrained('yiyanghkust/finbert-tone')
-model = AutoModelForSequenceClassification.from_pretrained('yiyanghkust/finbert-tone')
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from sentiment import BACKENDS, cache_key
+import score_server
+import dedup
+import incremental
+from annotated import compact, csv_frame, write_annotated
+from score_cache import ScoreCache, DEFAULT_CACHE
+from tweet_store import load_tweets
+import metrics as instrumentation
+from metrics import metrics
 
 # Regex pattern for Tesla mentions
 tesla_pattern = re.compile(r"\b[Tt]esla\b|\$TSLA\b")
@@ -14,35 +22,75 @@ tesla_pattern = re.compile(r"\b[Tt]esla\b|\$TSLA\b")
 ticker_pattern = re.compile(r"\$[A-Z]{1,5}\b")
 
 
-def annotate_and_filter(input_csv, output_csv):
-    df = pd.read_csv(input_csv, parse_dates=['createdAt'])
-    records = []
-    for _, row in df.iterrows():
-        text = row.get('fullText', row.get('text', ''))
-        # filter for Tesla mentions only
-        if not tesla_pattern.search(text):
-            continue
-        # sentiment scoring
-        inputs = tokenizer(text, return_tensors="pt", truncation=True)
-        outputs = model(**inputs)
-        scores = torch.nn.functional.softmax(outputs.logits, dim=1)[0]
-        sent_bear, sent_neut, sent_bull = scores.tolist()
-        # extract tickers
-        tickers = ticker_pattern.findall(text)
-        records.append({
-            **row.to_dict(),
-            'sent_bear': sent_bear,
-            'sent_neut': sent_neut,
-            'sent_bull': sent_bull,
-            'tickers': tickers
-        })
-    out_df = pd.DataFrame(records)
-    out_df.to_csv(output_csv, index=False)
+def annotate_and_filter(input_csv, output_csv, batch_size=32, cache=None, workers=1, backend='torch-fp32',
+                        client=None, dedup_threshold=None, incremental_mode=False):
+    df = load_tweets(input_csv, parse_dates=['createdAt'])
+    # incremental runs only annotate tweets past the output's watermark and upsert them by id
+    if incremental_mode:
+        df = df[incremental.after_watermark(df, incremental.get_watermark(output_csv), 'id', 'createdAt')]
+        print(f"{len(df)} tweets past the watermark of {output_csv}")
+    text_col = 'fullText' if 'fullText' in df.columns else 'text'
+    texts = df[text_col].fillna('').astype(str)
+    # filter for Tesla mentions only
+    with metrics.timer('match', items=len(df)):
+        out_df = df[texts.str.contains(tesla_pattern)].copy()
+    texts = texts[out_df.index]
+    metrics.count('rows_read', len(df))
+    metrics.count('rows_ticker_matched', len(out_df))
+    # one tweet per cluster of retweets and near-duplicates is scored, the rest share its scores
+    to_score = texts
+    if dedup_threshold is not None:
+        with metrics.timer('dedup', items=len(out_df)):
+            rows = dedup.clusters(out_df.assign(_text=texts), '_text', 'createdAt', threshold=dedup_threshold)
+        canon, _ = dedup.canonical(rows)
+        to_score = texts.iloc[canon]
+        metrics.count('rows_duplicate', len(out_df) - len(canon))
+    # sentiment scoring in length-bucketed mini-batches
+    scores = score_server.score_with(client, to_score.tolist(), backend=backend, batch_size=batch_size,
+                                     cache=cache, workers=workers)
+    if dedup_threshold is not None:
+        scores = dedup.broadcast(scores, rows)
+        dedup.add_cluster_columns(out_df, rows)
+    out_df['sent_bear'] = scores[:, 0]
+    out_df['sent_neut'] = scores[:, 1]
+    out_df['sent_bull'] = scores[:, 2]
+    # extract tickers, written in the shared annotated layout (comma-joined, without '$')
+    out_df['tickers'] = texts.str.findall(ticker_pattern)
+    frame, csr = compact(out_df)
+    size_before = os.path.getsize(output_csv) if incremental_mode and os.path.exists(output_csv) else 0
+    with metrics.timer('write'):
+        if incremental_mode:
+            incremental.upsert_csv(output_csv, csv_frame(frame, csr, 'tickers'))
+        else:
+            write_annotated(frame, csr, output_csv, ticker_col='tickers')
+    metrics.count('bytes_written', max(os.path.getsize(output_csv) - size_before, 0))
+    incremental.set_watermark(output_csv, df, 'id', 'createdAt', reset=not incremental_mode)
     print(f"Annotated and filtered {len(out_df)} Tesla-related tweets to {output_csv}")
+    if cache is not None:
+        print(cache.stats())
 
 if __name__ == '__main__':
-    import sys
-    if len(sys.argv) != 3:
-        print('Usage: python annotate_tesla.py <input_csv> <output_csv>')
-        sys.exit(1)
-    annotate_and_filter(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(description='Annotate Tesla-related tweets with FinBERT sentiment')
+    parser.add_argument('input_csv', help="Tweets CSV, or store:musk[:<start>[:<end>]] for the tweet store")
+    parser.add_argument('output_csv', help='CSV, or Parquet plus a .tickers.parquet ticker table')
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=1, help='Scoring processes sharing one model')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch-fp32', help='FinBERT inference backend')
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help='SQLite score cache path')
+    parser.add_argument('--no-cache', action='store_true', help='Rescore every tweet')
+    parser.add_argument('--dedup', type=float, nargs='?', const=dedup.THRESHOLD, metavar='THRESHOLD',
+                        help='Score one tweet per cluster of retweets and near-duplicates')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only annotate tweets past the watermark in cache/watermarks.json and upsert them by id')
+    score_server.add_arguments(parser)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    if args.incremental and args.output_csv.endswith('.parquet'):
+        parser.error('--incremental appends to a CSV output')
+    cache = None if args.no_cache else ScoreCache(args.cache)
+    client = None if args.no_server else score_server.connect(args.server, cache_key(backend=args.backend))
+    with instrumentation.instrumented(args, 'musk_annotate'):
+        annotate_and_filter(args.input_csv, args.output_csv, batch_size=args.batch_size, cache=cache,
+                            workers=args.workers, backend=args.backend, client=client,
+                            dedup_threshold=args.dedup, incremental_mode=args.incremental)
+    print(metrics.report())
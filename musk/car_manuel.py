@@ -1,90 +1,196 @@
-import yfinance as yf
+import argparse
+import os
+import sys
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-
-# Function to fetch stock data, calculate returns, and CAR
-def calculate_CAR(tweet_date, ticker='TSLA'):
-    tweet_datetime = datetime.strptime(tweet_date[:10], '%Y-%m-%d')
-    start_date = tweet_datetime - timedelta(days=30)
-    end_date = tweet_datetime + timedelta(days=5)
-
-    # Download stock data
-    stock_data = yf.download(ticker, start=start_date, end=end_date)
-    stock_data['Daily Return'] = stock_data['Close'].pct_change()
-
-    # Estimating expected return using market model approximation (mean of returns)
-    estimation_window = stock_data.loc[start_date:tweet_datetime - timedelta(days=1)]
-    expected_daily_return = estimation_window['Daily Return'].mean()
-
-    # Calculate Abnormal Returns (AR)
-    event_window = stock_data.loc[tweet_datetime + timedelta(days=1):tweet_datetime + timedelta(days=3)].copy()
-    event_window['Expected Return'] = expected_daily_return
-    event_window['Abnormal Return'] = event_window['Daily Return'] - event_window['Expected Return']
-
-    # Calculate CAR
-    CAR = event_window['Abnormal Return'].sum()
-    return CAR
-
-# Load CSV and process tweets
-tweets_df = pd.read_csv('musk_annotate.csv')
-results = []
-
-for index, row in tweets_df.iterrows():
-    tweet_id = row['id']
-    tweet_date = row['createdAt']
-    tweet_text = row['fullText']
-    CAR = calculate_CAR(tweet_date)
-    results.append({'id': tweet_id, 'date': tweet_date, 'text': tweet_text, 'CAR': CAR})
-
-# Output results
-results_df = pd.DataFrame(results)
-results_df.to_csv('tweets_CAR_results.csv', index=False)
-
-# Statistical Analysis
-mean_CAR = results_df['CAR'].mean()
-median_CAR = results_df['CAR'].median()
-max_CAR = results_df.loc[results_df['CAR'].idxmax()]
-min_CAR = results_df.loc[results_df['CAR'].idxmin()]
-
-print(f"Mean CAR: {mean_CAR:.4%}")
-print(f"Median CAR: {median_CAR:.4%}")
-print(f"Max CAR: {max_CAR['CAR']:.4%} on {max_CAR['date']} (Tweet ID: {max_CAR['id']})")
-print(f"Min CAR: {min_CAR['CAR']:.4%} on {min_CAR['date']} (Tweet ID: {min_CAR['id']})")
-
-# Visualization of CAR distribution
-plt.figure(figsize=(10,6))
-results_df['CAR'].hist(bins=30, edgecolor='black')
-plt.title('Distribution of CAR')
-plt.xlabel('CAR')
-plt.ylabel('Frequency')
-plt.axvline(mean_CAR, color='red', linestyle='dashed', linewidth=2, label=f'Mean CAR ({mean_CAR:.2%})')
-plt.legend()
-plt.grid(False)
-plt.savefig('CAR_distribution.png')
-
-# Find significant tweets
-significant_tweets = results_df[(results_df['CAR'] >= 0.10) | (results_df['CAR'] <= -0.10)]
-significant_tweets.to_csv('significant_tweets.csv', index=False)
-
-# Plot Tesla stock price with significant tweet markers
-full_start_date = datetime.strptime(tweets_df['createdAt'].min()[:10], '%Y-%m-%d') - timedelta(days=30)
-full_end_date = datetime.strptime(tweets_df['createdAt'].max()[:10], '%Y-%m-%d') + timedelta(days=5)
-full_stock_data = yf.download('TSLA', start=full_start_date, end=full_end_date)
-
-plt.figure(figsize=(14, 7))
-plt.plot(full_stock_data['Close'], label='Tesla Stock Price')
-
-for _, tweet in significant_tweets.iterrows():
-    tweet_date = datetime.strptime(tweet['date'][:10], '%Y-%m-%d')
-    if tweet_date in full_stock_data.index:
+
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from price_store import PriceStore
+from event_study import ESTIMATION_WINDOW, compute_car, load_ff_factors, window_label
+from trading_calendar import get_calendar
+import car_stats
+import dedup
+import incremental
+import metrics as instrumentation
+from metrics import metrics
+
+parser = argparse.ArgumentParser(description='Event-study CAR for Tesla-related Musk tweets')
+parser.add_argument('--model', choices=['mean', 'market', 'ff'], default='mean',
+                    help='Normal-return model: constant mean, market model on SPY, or Fama-French factors')
+parser.add_argument('--ff-factors', help='Ken French daily factors CSV, required for --model ff')
+parser.add_argument('--input', default='musk_annotate.csv', help='Annotated Tesla tweets CSV')
+parser.add_argument('--output', default='tweets_CAR_results.csv')
+parser.add_argument('--tests-output', default='car_tests.csv', help='Significance tests per sentiment bucket')
+parser.add_argument('--resamples', type=int, default=car_stats.N_RESAMPLES, help='Bootstrap and placebo resamples')
+parser.add_argument('--seed', type=int, default=0)
+parser.add_argument('--workers', type=int, default=1, help='Processes for the resampling chunks')
+parser.add_argument('--dedup', type=float, nargs='?', const=dedup.THRESHOLD, metavar='THRESHOLD',
+                    help='Count retweets and near-duplicate tweets on the same trading day as one event')
+parser.add_argument('--incremental', action='store_true',
+                    help='Only compute tweets past the watermark and events whose window was still open, '
+                         'upserting them into --output by id')
+parser.add_argument('--alpha', type=float, default=0.05,
+                    help='Flag tweets whose CAR has a placebo p-value below this as significant')
+instrumentation.add_arguments(parser)
+args = parser.parse_args()
+if args.model == 'ff' and not args.ff_factors:
+    parser.error('--model ff needs --ff-factors')
+
+# Profile and collect metrics for the whole script; closed even when a step fails
+with instrumentation.instrumented(args, 'car_manuel'):
+    store = PriceStore()
+
+    # Event windows in trading days relative to the tweet's trading day; (1, 3) is reported as CAR
+    EVENT_WINDOWS = [(1, 3), (0, 1), (-1, 5)]
+
+    # Load CSV and process tweets
+    tweets_df = pd.read_csv(args.input)
+
+    # Load the whole sample's prices once, with room for the estimation and event windows
+    # (counted in trading sessions, plus one session for the first return)
+    calendar = get_calendar()
+    event_sessions = calendar.event_sessions(tweets_df['createdAt'])
+    event_sessions = event_sessions[event_sessions >= 0]
+    full_start_date = calendar.session_dates(calendar.offset(event_sessions.min(keepdims=True),
+                                                             ESTIMATION_WINDOW[0] - 1))[0]
+    full_end_date = calendar.session_dates(calendar.offset(event_sessions.max(keepdims=True),
+                                                           max(w[1] for w in EVENT_WINDOWS)))[0] + pd.Timedelta(days=1)
+    with metrics.timer('load_prices'):
+        full_stock_data = store.get_bars('TSLA', full_start_date, full_end_date)
+        returns = full_stock_data['Close'].pct_change().to_frame('TSLA')
+        market = None
+        factors = None
+        if args.model == 'market':
+            market = store.get_bars('SPY', full_start_date, full_end_date)['Close'].pct_change()
+        elif args.model == 'ff':
+            factors = load_ff_factors(args.ff_factors)
+
+    # Each tweet's event: itself, or with --dedup the earliest of its duplicates on the same trading day
+    event_pos = np.arange(len(tweets_df))
+    if args.dedup is not None:
+        with metrics.timer('dedup', items=len(tweets_df)):
+            clusters = dedup.clusters(tweets_df, 'fullText', 'createdAt', threshold=args.dedup)
+            event_pos = dedup.event_clusters(clusters, tweets_df['createdAt'], calendar)
+
+    # Tweets to compute: all of them, or incrementally the ones past the watermark or missing from the
+    # output, plus those whose event window was still open last time (their prices are final once it closes)
+    todo = np.ones(len(tweets_df), dtype=bool)
+    existing = None
+    if args.incremental and os.path.exists(args.output):
+        existing = pd.read_csv(args.output)
+        todo = incremental.after_watermark(tweets_df, incremental.get_watermark(args.output), 'id', 'createdAt')
+        todo |= ~tweets_df['id'].isin(existing['id']).to_numpy()
+        if 'window_closed' in existing.columns:
+            todo |= tweets_df['id'].isin(existing.loc[~existing['window_closed'].astype(bool), 'id']).to_numpy()
+        print(f"{todo.sum()} of {len(tweets_df)} tweets are new or waiting for their event window to close")
+    rows = np.flatnonzero(todo)
+    canon, inverse = dedup.canonical(event_pos[rows])
+
+    # Abnormal returns, CAR and standardized CAR for every event in one vectorized pass, copied to its duplicates
+    event_tweets = tweets_df.iloc[canon]
+    with metrics.timer('compute_car', items=len(canon)):
+        cars = compute_car(returns, event_tweets['createdAt'], ['TSLA'] * len(canon), windows=EVENT_WINDOWS,
+                           market=market, factors=factors)
+    cars = cars.iloc[inverse].reset_index(drop=True)
+    metrics.count('events', len(canon))
+    todo_tweets = tweets_df.iloc[rows]
+    results_df = pd.DataFrame({
+        'id': todo_tweets['id'].to_numpy(),
+        'date': todo_tweets['createdAt'].to_numpy(),
+        'text': todo_tweets['fullText'].to_numpy(),
+        'CAR': cars[window_label(EVENT_WINDOWS[0])].to_numpy()
+    })
+    for window in EVENT_WINDOWS[1:]:
+        results_df[window_label(window)] = cars[window_label(window)].to_numpy()
+    for col in ['alpha', 'beta', 'resid_var', 'est_dof']:
+        results_df[col] = cars[col].to_numpy()
+    results_df['SCAR'] = cars[window_label(EVENT_WINDOWS[0], 'SCAR')].to_numpy()
+    results_df['sentiment'] = car_stats.sentiment_buckets(todo_tweets).to_numpy()
+    # Final once every event window has ended and all of its days have prices
+    priced_days = returns.index[returns['TSLA'].notna()]
+    if market is not None:
+        priced_days = priced_days.intersection(market.index[market.notna()])
+    if factors is not None:
+        priced_days = priced_days.intersection(factors.dropna().index)
+    results_df['window_closed'] = incremental.window_closed(
+        todo_tweets['createdAt'], (min(w[0] for w in EVENT_WINDOWS), max(w[1] for w in EVENT_WINDOWS)),
+        dates=priced_days, calendar=calendar)
+    if existing is not None:
+        results_df = incremental.upsert(existing.drop(columns=['p_placebo', 'canonical_id', 'cluster_size'],
+                                                      errors='ignore'), results_df)
+    is_event = np.ones(len(results_df), dtype=bool)
+    if args.dedup is not None:
+        # Clusters are refreshed for every stored row; a tweet's CAR is its event day's, so it stays valid
+        clustered = dedup.add_cluster_columns(tweets_df[['id']].copy(), event_pos).set_index('id')
+        results_df['canonical_id'] = results_df['id'].map(clustered['canonical_id'])
+        results_df['cluster_size'] = results_df['id'].map(clustered['cluster_size'])
+        is_event = (results_df['canonical_id'] == results_df['id']).to_numpy()
+        print(f"{len(tweets_df)} tweets form {len(np.unique(event_pos))} events after collapsing duplicates")
+
+    # Null distribution: the same CAR on every trading day without a tweet
+    with metrics.timer('placebo_pool'):
+        pool = car_stats.placebo_pool(returns, tweets_df['createdAt'], 'TSLA', EVENT_WINDOWS[0],
+                                      market=market, factors=factors)
+    results_df['p_placebo'] = car_stats.placebo_p(results_df['CAR'].to_numpy(), pool)
+
+    # Output results; the watermark only moves once they are written
+    results_df.to_csv(args.output, index=False)
+    incremental.set_watermark(args.output, todo_tweets, 'id', 'createdAt', reset=not args.incremental)
+
+    # Statistical Analysis, one row per event so duplicates are not counted twice
+    events_df = results_df[is_event]
+    mean_CAR = events_df['CAR'].mean()
+    median_CAR = events_df['CAR'].median()
+    max_CAR = events_df.loc[events_df['CAR'].idxmax()]
+    min_CAR = events_df.loc[events_df['CAR'].idxmin()]
+
+    print(f"Mean CAR: {mean_CAR:.4%}")
+    print(f"Median CAR: {median_CAR:.4%}")
+    print(f"Max CAR: {max_CAR['CAR']:.4%} on {max_CAR['date']} (Tweet ID: {max_CAR['id']})")
+    print(f"Min CAR: {min_CAR['CAR']:.4%} on {min_CAR['date']} (Tweet ID: {min_CAR['id']})")
+
+    # Patell, BMP, bootstrap and placebo tests of mean CAR, overall and per sentiment bucket
+    with metrics.timer('car_tests', items=args.resamples):
+        tests = car_stats.event_tests(events_df['CAR'], events_df['SCAR'], events_df['est_dof'],
+                                      events_df['sentiment'], pool, n_resamples=args.resamples, seed=args.seed,
+                                      workers=args.workers)
+    tests.to_csv(args.tests_output)
+    print(f"\nSignificance of mean {window_label(EVENT_WINDOWS[0])} ({args.resamples:,} resamples, "
+          f"{len(pool)} non-tweet days):")
+    print(tests.to_string(float_format=lambda x: f'{x:.4g}'))
+
+    # Visualization of CAR distribution (matplotlib is only loaded once there is something to plot)
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10,6))
+    events_df['CAR'].hist(bins=30, edgecolor='black')
+    plt.title('Distribution of CAR')
+    plt.xlabel('CAR')
+    plt.ylabel('Frequency')
+    plt.axvline(mean_CAR, color='red', linestyle='dashed', linewidth=2, label=f'Mean CAR ({mean_CAR:.2%})')
+    plt.legend()
+    plt.grid(False)
+    plt.savefig('CAR_distribution.png')
+
+    # Significant tweets: CARs rarely seen on days without a tweet
+    significant_tweets = results_df[results_df['p_placebo'] < args.alpha]
+    significant_tweets.to_csv('significant_tweets.csv', index=False)
+
+    # Plot Tesla stock price with significant tweet markers
+    plt.figure(figsize=(14, 7))
+    plt.plot(full_stock_data['Close'], label='Tesla Stock Price')
+
+    # Marked on each tweet's event trading day
+    significant_days = calendar.event_days(significant_tweets['date'])
+    for tweet_date in significant_days[significant_days.isin(full_stock_data.index)]:
         plt.axvline(tweet_date, color='red', linestyle='--', linewidth=1)
 
-plt.title('Tesla Stock Price with Significant Tweets')
-plt.xlabel('Date')
-plt.ylabel('Stock Price (USD)')
-plt.legend()
-plt.grid(True)
-plt.savefig('Tesla_stock_significant_tweets.png')
+    plt.title('Tesla Stock Price with Significant Tweets')
+    plt.xlabel('Date')
+    plt.ylabel('Stock Price (USD)')
+    plt.legend()
+    plt.grid(True)
+    plt.savefig('Tesla_stock_significant_tweets.png')
 
-print("\nSignificant tweets graph saved as Tesla_stock_significant_tweets.png")
+    print("\nSignificant tweets graph saved as Tesla_stock_significant_tweets.png")
+print(metrics.report())
@@ -1,15 +1,25 @@
+import os
+import sys
 import pandas as pd
 
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tweet_store import has_source, load_tweets
+
 def main():
-    # Load full Elon Musk tweet dataset
-    df = pd.read_csv('all_musk_posts.csv', parse_dates=['createdAt'])
+    if has_source('musk'):
+        # Read only the month's partition from the Parquet tweet store
+        month_df = load_tweets('store:musk:2024-08-01:2024-09-01')
+    else:
+        # Load full Elon Musk tweet dataset
+        df = pd.read_csv('all_musk_posts.csv', parse_dates=['createdAt'])
 
-    # Filter to August 2018 (one month)
-    start = pd.to_datetime('2024-08-01')
-    end   = pd.to_datetime('2024-08-31')
-    mask = (df['createdAt'].dt.date >= start.date()) & \
-           (df['createdAt'].dt.date <= end.date())
-    month_df = df.loc[mask]
+        # Filter to August 2018 (one month)
+        start = pd.to_datetime('2024-08-01')
+        end   = pd.to_datetime('2024-08-31')
+        mask = (df['createdAt'].dt.date >= start.date()) & \
+               (df['createdAt'].dt.date <= end.date())
+        month_df = df.loc[mask]
 
     # Save filtered tweets
     month_df.to_csv('musk_aug2018_posts.csv', index=False)
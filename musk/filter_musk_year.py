@@ -1,16 +1,26 @@
+import os
+import sys
 import pandas as pd
 import argparse
 
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from tweet_store import has_source, load_tweets
+
 def main(year):
-    # Load full Elon Musk tweet dataset
-    df = pd.read_csv('musk/all_musk_posts.csv', parse_dates=['createdAt'])
+    if has_source('musk'):
+        # Read only this year's partitions from the Parquet tweet store
+        year_df = load_tweets(f'store:musk:{year}-01-01:{year + 1}-01-01')
+    else:
+        # Load full Elon Musk tweet dataset (run `python tweet_store.py ingest --source musk` to skip this)
+        df = pd.read_csv('musk/all_musk_posts.csv', parse_dates=['createdAt'])
 
-    # Filter to the specified calendar year
-    start = pd.to_datetime(f'{year}-01-01')
-    end   = pd.to_datetime(f'{year}-12-31')
-    mask = (df['createdAt'].dt.date >= start.date()) & \
-           (df['createdAt'].dt.date <= end.date())
-    year_df = df.loc[mask]
+        # Filter to the specified calendar year
+        start = pd.to_datetime(f'{year}-01-01')
+        end   = pd.to_datetime(f'{year}-12-31')
+        mask = (df['createdAt'].dt.date >= start.date()) & \
+               (df['createdAt'].dt.date <= end.date())
+        year_df = df.loc[mask]
 
     # Save filtered tweets
     output_file = f'musk_{year}_posts.csv'
@@ -1,69 +1,158 @@
+import argparse
+import os
+import sys
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from datetime import timedelta
 
-# Load Biden tweets dataset
-tweets = pd.read_csv('annotate_congress.csv', parse_dates=['date'])
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from price_store import PriceStore
+from trading_calendar import get_calendar
+from annotated import exploded, load_annotated, split_tickers, ticker_csr, write_annotated
+import metrics as instrumentation
+from metrics import metrics
+
 window_days=3
 threshold=0.02
-# Function to download and compute abnormal move
 
-def compute_move(ticker, ts):
-    if pd.isna(ticker) or ticker == '':
-        return None
 
-    # Split the ticker string into individual tickers
-    tickers = ticker.split(',')
+def explode_tickers(tweets, csr=None):
+    """
+    One row per (tweet, ticker) pair: the tweet's index label and the ticker,
+    from the frame's TickerCSR or else its 'matched_tickers' column.
+    """
+    if csr is None:
+        csr = ticker_csr(split_tickers(tweets['matched_tickers']))
+    pairs = exploded(csr)
+    return pd.DataFrame({'row': tweets.index[pairs['row'].to_numpy()],
+                         'ticker': pairs['ticker'].astype(str).to_numpy()})
 
-    # Initialize variables to store the results
-    moves = []
 
+def load_closes(store, tickers, start, end):
+    """Dates x tickers close prices, read once per unique ticker from the price store."""
+    columns = {}
     for single_ticker in tickers:
         try:
-            # Fetch price data for the individual ticker
-            df = yf.download(
-                single_ticker,
-                start=(ts - timedelta(days=1)).strftime('%Y-%m-%d'),
-                end=(ts + timedelta(days=window_days + 1)).strftime('%Y-%m-%d'),
-                progress=False
-            )
+            df = store.get_bars(single_ticker, start, end)
         except Exception:
             continue
+        if not df.empty:
+            columns[single_ticker] = df['Close']
+    return pd.DataFrame(columns).sort_index()
 
-        if df.empty:
-            continue
 
-        # Convert index to naive dates for comparison
-        df.index = df.index.tz_localize(None)
+def pair_returns(sessions, tickers, closes, window_days=window_days, calendar=None):
+    """
+    Return over window_days trading sessions for every (event session, ticker)
+    pair: from the last close before the event session to the close of its
+    window_days-th session. sessions are trading-calendar positions.
+    """
+    cal = calendar or get_calendar()
+    values = closes.to_numpy(dtype=np.float64)
+    n_dates = len(values)
+    dates = pd.DatetimeIndex(closes.index)
+    steps = np.arange(n_dates)[:, None]
 
-        # Compute the move for the individual ticker
-        try:
-            day0 = float(df['Close'].iloc[0])  # First day's close price
-            dayN = float(df['Close'].iloc[-1])  # Last day's close price
-            ret = (dayN - day0) / day0  # Calculate return
-
-            # Compare the return with the threshold
-            if ret > threshold:
-                moves.append('up')
-            elif ret < -threshold:
-                moves.append('down')
-            else:
-                moves.append('neutral')
-        except Exception:
-            continue
+    # For each row, the nearest row at or before it with a price, per ticker (shifted down one row)
+    has_price = ~np.isnan(values)
+    prev_valid = np.maximum.accumulate(np.where(has_price, steps, -1), axis=0)
+    prev_valid = np.vstack([np.full((1, values.shape[1]), -1), prev_valid])
+
+    sessions = np.asarray(sessions, dtype=np.int64)
+    base = cal.offset(sessions, -1)
+    end = cal.offset(sessions, window_days - 1)
+    cols = closes.columns.get_indexer(pd.Index(tickers))
+    known = (cols >= 0) & (base >= 0) & (end >= 0)
+    lo = dates.searchsorted(cal.session_dates(base[known]), side='right')
+    hi = dates.searchsorted(cal.session_dates(end[known]), side='right')
+
+    rets = np.full(len(cols), np.nan)
+    first = prev_valid[lo, cols[known]]
+    last = prev_valid[hi, cols[known]]
+    ok = (first >= 0) & (first < last)
+    k_cols = cols[known][ok]
+    idx = np.flatnonzero(known)[ok]
+    rets[idx] = values[last[ok], k_cols] / values[first[ok], k_cols] - 1
+    return rets
+
+
+def price_range(event_times, window_days=window_days):
+    """[start, end) dates of the closes needed to label events with window_days-session moves."""
+    cal = get_calendar()
+    sessions = cal.event_sessions(event_times)
+    sessions = sessions[sessions >= 0]
+    start = cal.session_dates(cal.offset(sessions.min(keepdims=True), -1))[0]
+    end = cal.session_dates(cal.offset(sessions.max(keepdims=True), window_days - 1))[0]
+    return start, end + pd.Timedelta(days=1)
+
+
+def move_labels(rets, threshold=threshold):
+    labels = np.select([rets > threshold, rets < -threshold], ['up', 'down'], 'neutral').astype(object)
+    labels[np.isnan(rets)] = None
+    return labels
+
+
+def label_moves(tweets, closes, window_days=window_days, threshold=threshold, csr=None):
+    """
+    Per-ticker and aggregate price-move labels for every tweet.
+    The aggregate label uses the mean return across the tweet's tickers.
+    """
+    pairs = explode_tickers(tweets, csr)
+    # Each tweet counts from the first session it can affect; after-hours tweets roll forward
+    sessions = pd.Series(get_calendar().event_sessions(tweets['date']), index=tweets.index)
+    pairs['ret'] = pair_returns(sessions.loc[pairs['row']].to_numpy(), pairs['ticker'], closes, window_days)
+    pairs['move'] = move_labels(pairs['ret'].to_numpy(), threshold)
+
+    known = pairs.dropna(subset=['ret'])
+    out = pd.DataFrame(index=tweets.index)
+    if known.empty:
+        # No (tweet, ticker) pair has prices, e.g. offline: every label is missing
+        out['price_ret'] = np.nan
+        out['price_move'] = None
+        out['price_moves'] = None
+        return out
+    mean_ret = known.groupby('row')['ret'].mean().reindex(tweets.index)
+    per_ticker = known['ticker'].str.cat(known['move'].astype(str), sep=':').groupby(known['row']).agg(','.join)
+    out['price_ret'] = mean_ret
+    out['price_move'] = move_labels(mean_ret.to_numpy(), threshold)
+    out['price_moves'] = per_ticker.reindex(tweets.index)
+    return out
+
+
+def run(args):
+    """Label args.input and write args.output."""
+    # Load Biden tweets dataset
+    tweets, csr = load_annotated(args.input)
+    store = PriceStore()
+
+    print(f"Loading price data once per unique ticker and computing {args.window_days}-day moves...")
+    tickers = csr.tickers[np.unique(csr.indices)]
+    with metrics.timer('load_prices'):
+        closes = load_closes(store, tickers, *price_range(tweets['date'], args.window_days))
+    with metrics.timer('label_moves', items=len(tweets)):
+        labels = label_moves(tweets, closes, args.window_days, args.threshold, csr)
+    metrics.count('rows_read', len(tweets))
+    for col in labels.columns:
+        tweets[col] = labels[col]
+
+    # Save result
+    write_annotated(tweets, csr, args.output)
+    print(f"Saved enriched file: {args.output}")
 
-    # Return the result for the first ticker or aggregate results
-    return moves[0] if moves else None
 
-# Initialize price_move column
-tweets['price_move'] = None
+def main():
+    parser = argparse.ArgumentParser(description='Label annotated tweets with the price move of their tickers')
+    parser.add_argument('--input', default='annotate_congress.csv', help='Annotated tweets, CSV or Parquet')
+    parser.add_argument('--output', default='annotate_congress_with_price_moves.csv',
+                        help='CSV, or Parquet with a .tickers.parquet ticker table')
+    parser.add_argument('--window-days', type=int, default=window_days)
+    parser.add_argument('--threshold', type=float, default=threshold)
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    with instrumentation.instrumented(args, 'label_moves'):
+        run(args)
+    print(metrics.report())
 
-print("Fetching price data and computing 3-day moves (using for-loop)...")
-# Iterate over rows with a for-loop
-for idx, row in tweets.iterrows():
-    move = compute_move(row['matched_tickers'], row['date'])
-    tweets.at[idx, 'price_move'] = move
 
-# Save result
-tweets.to_csv('annotate_congress_with_price_moves.csv', index=False)
-print("Saved enriched file: annotate_joe_with_price_moves.csv")
+if __name__ == '__main__':
+    main()
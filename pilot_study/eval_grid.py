@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+# Class order shared by the score columns and the price-move labels
+SCORE_COLS = ['sent_bear', 'sent_neut', 'sent_bull']
+SENTIMENTS = ['bear', 'neut', 'bull']
+MOVES = ['down', 'neutral', 'up']
+
+
+def top_two(scores):
+    """
+    Top and runner-up class per row of an (n, 3) score matrix, and the margin between them.
+    Ties keep the bear/neut/bull order, like a stable descending sort.
+    """
+    order = np.argsort(-scores, axis=1, kind='stable')
+    rows = np.arange(len(scores))
+    top, second = order[:, 0], order[:, 1]
+    return top, second, scores[rows, top] - scores[rows, second]
+
+
+def predict(top, second, margin, eps):
+    """Top class when it beats the runner-up by at least eps, otherwise the runner-up."""
+    return np.where(margin >= eps, top, second)
+
+
+def move_codes(moves):
+    """Price-move labels as 0/1/2 codes, -1 where missing."""
+    return pd.Series(moves).map({m: i for i, m in enumerate(MOVES)}).fillna(-1).to_numpy(dtype=np.int64)
+
+
+def ret_codes(rets, threshold):
+    """Label codes for raw returns at a move threshold, -1 where the return is missing."""
+    codes = np.where(rets > threshold, 2, np.where(rets < -threshold, 0, 1))
+    return np.where(np.isnan(rets), -1, codes)
+
+
+def grid_confusion(y_true, top, second, margin, eps_grid):
+    """
+    (G, 3, 3) confusion matrices (true x predicted) for every eps in a sorted grid.
+    A row predicts its top class for every eps <= its margin and its runner-up
+    for the rest, so each row is counted once with bincount and the grid is
+    filled with cumulative sums instead of re-predicting per eps.
+    """
+    keep = y_true >= 0
+    y_true, top, second, margin = y_true[keep], top[keep], second[keep], margin[keep]
+    G = len(eps_grid)
+    k = np.searchsorted(eps_grid, margin, side='right')  # number of eps values <= margin
+    top_counts = np.bincount(k * 9 + y_true * 3 + top, minlength=(G + 1) * 9).reshape(G + 1, 9)
+    second_counts = np.bincount(k * 9 + y_true * 3 + second, minlength=(G + 1) * 9).reshape(G + 1, 9)
+    # eps index g predicts top for rows with k > g and the runner-up for rows with k <= g
+    cm = np.cumsum(top_counts[::-1], axis=0)[::-1][1:] + np.cumsum(second_counts, axis=0)[:G]
+    return cm.reshape(G, 3, 3)
+
+
+def macro_f1(cm):
+    """Macro F1 over the three classes for a stack of confusion matrices (0 for empty classes)."""
+    tp = np.diagonal(cm, axis1=-2, axis2=-1).astype(np.float64)
+    denom = cm.sum(axis=-1) + cm.sum(axis=-2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        f1 = np.where(denom > 0, 2 * tp / denom, 0.0)
+    return f1.mean(axis=-1)
+
+
+def eps_surface(scores, y_true, eps_grid):
+    """Macro F1 for every eps in the grid."""
+    eps_grid = np.sort(np.asarray(eps_grid, dtype=np.float64))
+    valid = ~np.isnan(scores).any(axis=1)
+    top, second, margin = top_two(np.nan_to_num(scores))
+    y = np.where(valid, y_true, -1)
+    return pd.DataFrame({'eps': eps_grid, 'macro_f1': macro_f1(grid_confusion(y, top, second, margin, eps_grid))})
+
+
+def full_surface(scores, rets_by_window, thresholds, eps_grid):
+    """Macro F1 over window_days x threshold x eps, from per-tweet returns for each window."""
+    frames = []
+    for window_days, rets in rets_by_window.items():
+        for threshold in thresholds:
+            surface = eps_surface(scores, ret_codes(np.asarray(rets, dtype=np.float64), threshold), eps_grid)
+            surface.insert(0, 'threshold', threshold)
+            surface.insert(0, 'window_days', window_days)
+            frames.append(surface)
+    return pd.concat(frames, ignore_index=True)
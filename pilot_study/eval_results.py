@@ -1,60 +1,70 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
 import pandas as pd
-import yfinance as yf
-from datetime import timedelta
-from sklearn.metrics import classification_report, confusion_matrix
 
-# Load Biden tweets dataset (with price moves)
-tweets = pd.read_csv('annotate_congress_with_price_moves.csv', parse_dates=['date'])
+# Shared helpers live at the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from eval_grid import SCORE_COLS, SENTIMENTS, MOVES, eps_surface, full_surface, move_codes, predict, top_two
 
-# 1) Grisd-search eps to maximize macro F1
-from sklearn.metrics import f1_score
+parser = argparse.ArgumentParser(description='Evaluate FinBERT sentiment against price moves')
+parser.add_argument('--input', default='annotate_congress_with_price_moves.csv')
+parser.add_argument('--eps-points', type=int, default=1001, help='Points in the eps grid over [0, 1]')
+parser.add_argument('--windows', type=int, nargs='*', default=[],
+                    help='Also sweep these window_days values (re-labels moves from the price store)')
+parser.add_argument('--thresholds', type=float, nargs='*', default=[0.01, 0.02, 0.03, 0.05],
+                    help='Move thresholds swept together with --windows')
+parser.add_argument('--surface', default='pilot_study/f1_surface.csv')
+parser.add_argument('--confusion', default='pilot_study/confusion_matrix_price.csv')
+args = parser.parse_args()
+from sklearn.metrics import classification_report, confusion_matrix
 
-eps_values = [0, 0.02, 0.05, 0.1, 0.2]
-best = {'eps': None, 'f1': -1}
+# Load Biden tweets dataset (with price moves)
+tweets = pd.read_csv(args.input)
+scores = tweets[SCORE_COLS].to_numpy(dtype=np.float64)
+y_true = move_codes(tweets['price_move'])
 
-label_map = {'bear': 'down', 'neut': 'neutral', 'bull': 'up'}
+# 1) Grid-search eps to maximize macro F1, all eps values at once
+eps_grid = np.linspace(0, 1, args.eps_points)
+start = time.perf_counter()
+surface = eps_surface(scores, y_true, eps_grid)
+print(f"Evaluated {len(eps_grid)} eps values in {time.perf_counter() - start:.3f}s")
 
-for eps in eps_values:
-    def pick_eps(r):
-        scores = {'bear': r['sent_bear'], 'neut': r['sent_neut'], 'bull': r['sent_bull']}
-        srt = sorted(scores, key=scores.get, reverse=True)
-        top, second = srt[0], srt[1]
-        if scores[top] - scores[second] >= eps:
-            pred = top
-        else:
-            pred = second  # runner-up fallback
-        return pred
+# Optionally sweep the labeling parameters from eval.py as well
+if args.windows:
+    from eval import explode_tickers, label_moves, load_closes, move_labels, price_range
+    from price_store import PriceStore
 
-    tweets['model_pred_tmp'] = tweets.apply(pick_eps, axis=1)
-    tweets['model_move_tmp'] = tweets['model_pred_tmp'].map(label_map)
-    df_tmp = tweets.dropna(subset=['price_move', 'model_move_tmp'])
-    f1 = f1_score(df_tmp['price_move'], df_tmp['model_move_tmp'], average='macro', labels=['down','neutral','up'])
-    if f1 > best['f1']:
-        best = {'eps': eps, 'f1': f1}
+    tickers = explode_tickers(tweets)['ticker'].unique()
+    closes = load_closes(PriceStore(), tickers, *price_range(tweets['date'], max(args.windows)))
+    rets = {w: label_moves(tweets, closes, window_days=w)['price_ret'].to_numpy() for w in args.windows}
+    start = time.perf_counter()
+    surface = full_surface(scores, rets, args.thresholds, eps_grid)
+    print(f"Evaluated {len(surface)} (window_days, threshold, eps) points in {time.perf_counter() - start:.3f}s")
 
-print(f"Best eps: {best['eps']} with macro-F1={best['f1']:.3f}")
+surface.to_csv(args.surface, index=False)
+print(f"Saved macro-F1 surface to {args.surface}")
 
-# Now apply best eps to get final predictions
+best = surface.loc[surface['macro_f1'].idxmax()]
 best_eps = best['eps']
-def pick_pred(r):
-    scores = {'bear': r['sent_bear'], 'neut': r['sent_neut'], 'bull': r['sent_bull']}
-    srt = sorted(scores, key=scores.get, reverse=True)
-    top, second = srt[0], srt[1]
-    if scores[top] - scores[second] >= best_eps:
-        return top
-    else:
-        return second
+print(f"Best eps: {best_eps:.3f} with macro-F1={best['macro_f1']:.3f}")
+if args.windows:
+    print(f"  at window_days={int(best['window_days'])}, threshold={best['threshold']}")
+    # The final report uses the labels of the chosen configuration, not the input file's
+    tweets['price_move'] = move_labels(rets[int(best['window_days'])], best['threshold'])
 
-tweets['model_pred'] = tweets.apply(pick_pred, axis=1)
+# Now apply best eps to get final predictions
+top, second, margin = top_two(np.nan_to_num(scores))
+pred = predict(top, second, margin, best_eps)
+tweets['model_pred'] = np.asarray(SENTIMENTS, dtype=object)[pred]
 # 2) Map sentiment labels to price move categories
-label_map = {'bear': 'down', 'neut': 'neutral', 'bull': 'up'}
-tweets['model_move'] = tweets['model_pred'].map(label_map)
-label_map = {'bear': 'down', 'neut': 'neutral', 'bull': 'up'}
-tweets['model_move'] = tweets['model_pred'].map(label_map)
+tweets['model_move'] = np.asarray(MOVES, dtype=object)[pred]
 
 # 3) Evaluate against actual price moves
 # Drop any rows where we couldn’t compute a move
-eval_df = tweets.dropna(subset=['price_move', 'model_move'])
+eval_df = tweets.dropna(subset=['price_move', 'model_move'] + SCORE_COLS)
 
 y_true = eval_df['price_move']
 y_pred = eval_df['model_move']
@@ -68,5 +78,5 @@ print(pd.DataFrame(cm, index=['true_down','true_neutral','true_up'], columns=['p
 
 # Optionally save
 cm_df = pd.DataFrame(cm, index=['true_down','true_neutral','true_up'], columns=['pred_down','pred_neutral','pred_up'])
-cm_df.to_csv('pilot_study/confusion_matrix_price.csv')
-print("\nSaved confusion matrix as pilot_study/confusion_matrix_price.csv")
+cm_df.to_csv(args.confusion)
+print(f"\nSaved confusion matrix as {args.confusion}")
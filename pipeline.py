@@ -0,0 +1,332 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STATE = os.path.join(ROOT, 'cache', 'pipeline_state.json')
+
+
+def local_imports(script):
+    """
+    Repository modules script imports, directly or through other local modules,
+    as paths relative to the root. A module is looked up next to the importing
+    file first, then at the root (the scripts put the root on sys.path).
+    """
+    found, todo = [], [script]
+    while todo:
+        path = todo.pop()
+        with open(os.path.join(ROOT, path), encoding='utf-8') as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.update(a.name.split('.')[0] for a in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.add(node.module.split('.')[0])
+        for name in sorted(names):
+            for folder in dict.fromkeys([os.path.dirname(path), '']):
+                candidate = os.path.join(folder, name + '.py')
+                if os.path.exists(os.path.join(ROOT, candidate)):
+                    if candidate != script and candidate not in found:
+                        found.append(candidate)
+                        todo.append(candidate)
+                    break
+    return sorted(found)
+
+
+class Stage:
+    """
+    One pipeline step: a script run with arguments built from its params.
+    inputs/outputs are paths relative to the repository root; code lists
+    further files whose changes should also rerun the stage, on top of the
+    script and every local module it imports.
+    """
+
+    def __init__(self, name, script, args, inputs, outputs, params=None, code=(), manual=False):
+        self.name = name
+        self.script = script
+        self.args = args
+        self.params = dict(params or {})
+        self.inputs = inputs
+        self.outputs = outputs
+        self.code = [script] + [p for p in dict.fromkeys(local_imports(script) + list(code)) if p != script]
+        self.manual = manual
+
+    def paths(self, paths):
+        return [p.format(**self.params) for p in paths]
+
+    def command(self):
+        return [sys.executable, self.script] + [str(a).format(**self.params) for a in self.args]
+
+
+# Raw inputs are params so another dump can be swapped in with --set
+STAGES = [
+    Stage('harvest', 'harvest_async.py',
+          ['--users-file', '{users_file}', '--output', '{congress_raw}', '--state', 'cache/harvest_state.json'],
+          inputs=['{users_file}'], outputs=['{congress_raw}'],
+          params={'users_file': 'congress_handles.txt', 'congress_raw': 'congress_tweets.csv'},
+          manual=True),
+    Stage('annotate_congress', 'general_annotate.py',
+          ['{congress_raw}', 'annotate_congress.csv', '{stocks}', '--batch-size', '{batch_size}',
+           '--backend', '{backend}'],
+          inputs=['{congress_raw}', '{stocks}'], outputs=['annotate_congress.csv'],
+          params={'congress_raw': 'congress_tweets.csv', 'stocks': 'sp100_context.csv',
+                  'batch_size': 32, 'backend': 'torch-fp32'}),
+    Stage('label_moves', 'pilot_study/eval.py',
+          ['--input', 'annotate_congress.csv', '--output', 'annotate_congress_with_price_moves.csv',
+           '--window-days', '{window_days}', '--threshold', '{threshold}'],
+          inputs=['annotate_congress.csv'], outputs=['annotate_congress_with_price_moves.csv'],
+          params={'window_days': 3, 'threshold': 0.02}),
+    Stage('cross_section', 'cross_section.py',
+          ['annotate_congress.csv', '--stocks', '{stocks}', '--model', '{model}',
+           '--output', 'cross_section_cars.csv', '--summary', 'cross_section_summary.csv'],
+          inputs=['annotate_congress.csv', '{stocks}'],
+          outputs=['cross_section_cars.csv', 'cross_section_summary.csv'],
+          params={'stocks': 'sp100_context.csv', 'model': 'market'}),
+    Stage('evaluate', 'pilot_study/eval_results.py',
+          ['--input', 'annotate_congress_with_price_moves.csv', '--eps-points', '{eps_points}',
+           '--surface', 'pilot_study/f1_surface.csv', '--confusion', 'pilot_study/confusion_matrix_price.csv'],
+          inputs=['annotate_congress_with_price_moves.csv'],
+          outputs=['pilot_study/f1_surface.csv', 'pilot_study/confusion_matrix_price.csv'],
+          params={'eps_points': 1001}),
+    Stage('annotate_musk', 'musk/annotate.py',
+          ['{musk_raw}', 'musk_annotate.csv', '--batch-size', '{batch_size}', '--backend', '{backend}'],
+          inputs=['{musk_raw}'], outputs=['musk_annotate.csv'],
+          params={'musk_raw': 'musk/all_musk_posts.csv', 'batch_size': 32, 'backend': 'torch-fp32'}),
+    Stage('car', 'musk/car_manuel.py',
+          ['--input', 'musk_annotate.csv', '--output', 'tweets_CAR_results.csv', '--model', '{model}'],
+          inputs=['musk_annotate.csv'],
+          outputs=['tweets_CAR_results.csv', 'significant_tweets.csv', 'CAR_distribution.png',
+                   'Tesla_stock_significant_tweets.png', 'car_tests.csv'],
+          params={'model': 'market'}),
+]
+
+
+class FileHasher:
+    """sha256 of file contents, re-read only when a file's size or mtime changes."""
+
+    def __init__(self, known=None):
+        self.known = dict(known or {})
+
+    def __call__(self, path):
+        full = os.path.join(ROOT, path)
+        if not os.path.exists(full):
+            return None
+        st = os.stat(full)
+        entry = self.known.get(path)
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            return entry['sha256']
+        h = hashlib.sha256()
+        with open(full, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        self.known[path] = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha256': h.hexdigest()}
+        return h.hexdigest()
+
+
+def fingerprint(stage, hasher):
+    """Content hash of a stage's command, params, input files and code."""
+    spec = {
+        'command': stage.command()[1:],
+        'params': stage.params,
+        'inputs': {p: hasher(p) for p in stage.paths(stage.inputs)},
+        'code': {p: hasher(p) for p in stage.code},
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def dependencies(stages):
+    """Stage name -> names of the stages producing its inputs."""
+    producers = {out: s.name for s in stages for out in s.paths(s.outputs)}
+    return {s.name: {producers[p] for p in s.paths(s.inputs) if p in producers and producers[p] != s.name}
+            for s in stages}
+
+
+def select(stages, targets):
+    """The targets plus everything upstream of them; without targets, every non-manual stage."""
+    by_name = {s.name: s for s in stages}
+    if not targets:
+        return [s for s in stages if not s.manual]
+    deps = dependencies(stages)
+    wanted, todo = set(), list(targets)
+    while todo:
+        name = todo.pop()
+        if name not in wanted:
+            wanted.add(name)
+            todo.extend(d for d in deps[name] if not by_name[d].manual or d in targets)
+    return [s for s in stages if s.name in wanted]
+
+
+def count_rows(path):
+    """Data rows in a CSV output (quoted newlines in tweet text are handled by the parser)."""
+    full = os.path.join(ROOT, path)
+    if not path.endswith('.csv') or not os.path.exists(full):
+        return None
+    return len(pd.read_csv(full, usecols=[0]))
+
+
+def run_stage(stage):
+    """Run one stage from the repository root; returns (returncode, seconds, log tail)."""
+    start = time.perf_counter()
+    proc = subprocess.run(stage.command(), cwd=ROOT, capture_output=True, text=True)
+    tail = (proc.stdout + proc.stderr).strip().splitlines()[-20:]
+    return proc.returncode, time.perf_counter() - start, tail
+
+
+def load_state(path):
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {'stages': {}, 'files': {}}
+
+
+def save_state(state, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def run(stages, state_path=DEFAULT_STATE, jobs=2, force=False, dry_run=False):
+    """
+    Run stages in dependency order, up to `jobs` at a time. A stage is skipped when
+    its fingerprint matches the last successful run and its outputs are still there.
+    Fingerprints are taken once the upstream stages finish, so a rerun upstream that
+    writes identical outputs does not invalidate anything downstream.
+    """
+    state = load_state(state_path)
+    hasher = FileHasher(state['files'])
+    deps = dependencies(stages)
+    names = {s.name for s in stages}
+    pending = {s.name: s for s in stages}
+    done, failed, report = set(), set(), []
+
+    def ready(name):
+        return all(d in done or d not in names for d in deps[name])
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        running = {}
+        while pending or running:
+            for name in [n for n in pending if any(d in failed for d in deps[n])]:
+                failed.add(name)
+                report.append({'stage': name, 'status': 'blocked'})
+                del pending[name]
+
+            for name in [n for n in pending if ready(n)]:
+                stage = pending.pop(name)
+                fp = fingerprint(stage, hasher)
+                missing = [p for p in stage.paths(stage.inputs) if hasher(p) is None]
+                outputs_ok = all(hasher(p) is not None for p in stage.paths(stage.outputs))
+                if not force and outputs_ok and state['stages'].get(name, {}).get('fingerprint') == fp:
+                    done.add(name)
+                    report.append({'stage': name, 'status': 'cached'})
+                elif missing and outputs_ok:
+                    # Raw dump not on this machine: keep the existing outputs
+                    done.add(name)
+                    report.append({'stage': name, 'status': 'kept', 'detail': missing})
+                elif missing:
+                    failed.add(name)
+                    report.append({'stage': name, 'status': 'missing input', 'detail': missing})
+                elif dry_run:
+                    done.add(name)
+                    report.append({'stage': name, 'status': 'would run', 'command': ' '.join(stage.command()[1:])})
+                else:
+                    print(f"[{name}] running: {' '.join(stage.command()[1:])}", flush=True)
+                    running[pool.submit(run_stage, stage)] = (stage, fp)
+
+            if not running:
+                if pending and not any(ready(n) or deps[n] & failed for n in pending):
+                    raise RuntimeError(f"Unresolvable stage dependencies: {sorted(pending)}")
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fp = running.pop(future)
+                code, seconds, tail = future.result()
+                entry = {'stage': stage.name, 'seconds': round(seconds, 2)}
+                if code == 0:
+                    done.add(stage.name)
+                    outputs = stage.paths(stage.outputs)
+                    state['stages'][stage.name] = {
+                        'fingerprint': fp,
+                        'finished': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                        'outputs': {p: hasher(p) for p in outputs},
+                    }
+                    entry.update(status='ran', rows={p: count_rows(p) for p in outputs if p.endswith('.csv')})
+                else:
+                    failed.add(stage.name)
+                    entry.update(status=f'failed ({code})', log=tail)
+                report.append(entry)
+                print(f"[{stage.name}] {entry['status']} in {seconds:.1f}s", flush=True)
+            state['files'] = hasher.known
+            if not dry_run:
+                save_state(state, state_path)
+
+    state['files'] = hasher.known
+    if not dry_run:
+        save_state(state, state_path)
+    return report
+
+
+def print_report(report):
+    print(f"\n{'stage':<20}{'status':<16}{'seconds':>9}  rows")
+    for entry in report:
+        rows = ', '.join(f"{os.path.basename(p)}={n}" for p, n in entry.get('rows', {}).items())
+        seconds = f"{entry['seconds']:.1f}" if 'seconds' in entry else '-'
+        print(f"{entry['stage']:<20}{entry['status']:<16}{seconds:>9}  {rows}")
+        for line in entry.get('log', []):
+            print(f"    {line}")
+        if 'detail' in entry:
+            print(f"    {entry['detail']}")
+        if 'command' in entry:
+            print(f"    {entry['command']}")
+
+
+def apply_overrides(stages, overrides):
+    """Apply --set stage.param=value (or param=value for every stage that has it)."""
+    for item in overrides:
+        key, _, raw = item.partition('=')
+        try:
+            value = ast.literal_eval(raw)
+        except (ValueError, SyntaxError):
+            value = raw
+        stage_name, _, param = key.rpartition('.')
+        matched = [s for s in stages if (not stage_name or s.name == stage_name) and param in s.params]
+        if not matched:
+            raise SystemExit(f"No stage has a parameter {key!r}")
+        for s in matched:
+            s.params[param] = value
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the harvest -> annotate -> label -> evaluate pipeline')
+    parser.add_argument('targets', nargs='*', help='Stages to bring up to date (with their upstream stages)')
+    parser.add_argument('--set', dest='overrides', action='append', default=[], metavar='STAGE.PARAM=VALUE')
+    parser.add_argument('--jobs', type=int, default=2, help='Independent stages run in parallel')
+    parser.add_argument('--force', action='store_true', help='Rerun the selected stages even when up to date')
+    parser.add_argument('--dry-run', action='store_true', help='Show what would run')
+    parser.add_argument('--list', action='store_true', help='List stages, their params and dependencies')
+    parser.add_argument('--state', default=DEFAULT_STATE)
+    args = parser.parse_args()
+
+    apply_overrides(STAGES, args.overrides)
+    unknown = set(args.targets) - {s.name for s in STAGES}
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+    if args.list:
+        deps = dependencies(STAGES)
+        for s in STAGES:
+            after = ', '.join(sorted(deps[s.name])) or '-'
+            print(f"{s.name:<20}after: {after:<20}{' (manual)' if s.manual else ''} {s.params}")
+        sys.exit(0)
+
+    report = run(select(STAGES, args.targets), args.state, args.jobs, args.force, args.dry_run)
+    print_report(report)
+    sys.exit(1 if any(e['status'].startswith(('failed', 'blocked', 'missing')) for e in report) else 0)
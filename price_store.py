@@ -0,0 +1,293 @@
+import contextlib
+import json
+import os
+import pandas as pd
+from metrics import metrics
+from trading_calendar import EXCHANGE_TZ, get_calendar
+try:
+    import fcntl
+except ImportError:
+    # No advisory locks (Windows): concurrent writers of one ticker are not serialized
+    fcntl = None
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'prices')
+
+DAILY_INTERVALS = {'1d', '5d', '1wk', '1mo', '3mo'}
+
+# Intraday files are written in small row groups so range reads can skip most of the file
+INTRADAY_ROW_GROUP = 20_000
+
+
+def yfinance_fetcher(ticker, start, end, interval):
+    """Download bars for [start, end) from Yahoo Finance."""
+    import yfinance as yf
+    # Yahoo serves at most 7 days of 1m bars per request
+    step = pd.Timedelta(days=7) if interval == '1m' else end - start
+    frames = []
+    for lo in pd.date_range(start, end, freq=step, inclusive='left'):
+        df = yf.download(
+            ticker,
+            start=lo.strftime('%Y-%m-%d'),
+            end=min(lo + step, end).strftime('%Y-%m-%d'),
+            interval=interval,
+            progress=False
+        )
+        # Recent yfinance versions return (field, ticker) columns even for one ticker
+        if isinstance(df.columns, pd.MultiIndex):
+            df.columns = df.columns.get_level_values(0)
+        if not df.empty:
+            frames.append(df)
+    return pd.concat(frames) if frames else pd.DataFrame()
+
+
+def csv_fetcher(directory):
+    """Fetcher that serves fixture bars from <directory>/<ticker>_<interval>.csv, for offline runs."""
+    def fetch(ticker, start, end, interval):
+        path = os.path.join(directory, f'{ticker}_{interval}.csv')
+        if not os.path.exists(path):
+            return pd.DataFrame()
+        df = pd.read_csv(path, index_col=0)
+        df.index = pd.to_datetime(df.index, utc=interval not in DAILY_INTERVALS)
+        lo, hi = _index_bounds(df.index, start, end)
+        return df[(df.index >= lo) & (df.index < hi)]
+    return fetch
+
+
+def _day_bounds(start, end):
+    """Whole-day [start, end) bounds as naive timestamps."""
+    start = pd.Timestamp(start)
+    end = pd.Timestamp(end)
+    if start.tz is not None:
+        start = start.tz_localize(None)
+    if end.tz is not None:
+        end = end.tz_localize(None)
+    start_day = start.normalize()
+    end_day = end.normalize()
+    if end_day < end:
+        end_day += pd.Timedelta(days=1)
+    return start_day, end_day
+
+
+def _index_bounds(index, start, end):
+    """Day bounds comparable with index: naive for daily bars, UTC for intraday bars."""
+    if getattr(index, 'tz', None) is not None:
+        return start.tz_localize('UTC'), end.tz_localize('UTC')
+    return start, end
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for s, e in sorted(ranges):
+        if merged and s <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], e)
+        else:
+            merged.append([s, e])
+    return merged
+
+
+def _missing_ranges(covered, start, end):
+    """Sub-ranges of [start, end) not in the covered list."""
+    gaps = []
+    cursor = start
+    for s, e in covered:
+        if e <= cursor:
+            continue
+        if s >= end:
+            break
+        if s > cursor:
+            gaps.append((cursor, min(s, end)))
+        cursor = max(cursor, e)
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+@contextlib.contextmanager
+def _locked(path):
+    """Exclusive advisory lock on path (created if needed) for the enclosed block."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'a') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _confirmed_range(fetched, start, end):
+    """
+    Part of the fetched range [start, end) that can be marked covered. A range
+    without trading sessions is complete with no bars. Otherwise only the days
+    from the first to the last bar returned count, unless the bars reach the
+    range's first or last session: an empty or truncated answer (network and
+    rate-limit errors, Yahoo's 30-day limit on 1m bars) is retried later.
+    """
+    sessions = get_calendar().sessions_between(start, end - pd.Timedelta(days=1))
+    if len(sessions) == 0:
+        return [start, end]
+    if fetched.empty:
+        return None
+    days = fetched.index
+    if days.tz is not None:
+        days = days.tz_convert(EXCHANGE_TZ).tz_localize(None)
+    first, last = days.min().normalize(), days.max().normalize()
+    lo = start if first <= sessions[0] else first
+    hi = end if last >= sessions[-1] else last + pd.Timedelta(days=1)
+    return [lo, hi]
+
+
+class PriceStore:
+    """
+    Local Parquet store of price bars per (ticker, interval).
+    Only date ranges that have not been fetched before go to the fetcher;
+    everything else is served from disk.
+    """
+
+    def __init__(self, root=DEFAULT_STORE, fetcher=yfinance_fetcher):
+        self.root = root
+        self.fetcher = fetcher
+        self.fetches = 0
+
+    def _paths(self, ticker, interval):
+        folder = os.path.join(self.root, interval)
+        name = ticker.replace('/', '_')
+        return os.path.join(folder, f'{name}.parquet'), os.path.join(folder, f'{name}.json')
+
+    def _covered(self, ticker, interval):
+        _, meta_path = self._paths(ticker, interval)
+        if not os.path.exists(meta_path):
+            return []
+        with open(meta_path) as f:
+            return [[pd.Timestamp(s), pd.Timestamp(e)] for s, e in json.load(f)['covered']]
+
+    def _load(self, ticker, interval, start=None, end=None):
+        """Stored bars and coverage; with start/end only row groups overlapping [start, end) are read."""
+        data_path, _ = self._paths(ticker, interval)
+        covered = self._covered(ticker, interval)
+        if not covered or not os.path.exists(data_path):
+            return pd.DataFrame(), covered
+        filters = None
+        if start is not None:
+            name = 'Date' if interval in DAILY_INTERVALS else 'Datetime'
+            lo, hi = start, end
+            if interval not in DAILY_INTERVALS:
+                lo, hi = start.tz_localize('UTC'), end.tz_localize('UTC')
+            filters = [(name, '>=', lo), (name, '<', hi)]
+        return pd.read_parquet(data_path, filters=filters), covered
+
+    def _save(self, ticker, interval, data, covered):
+        """
+        Replace the bars, then the coverage sidecar, each through a temporary
+        file: readers see whole files, and coverage never runs ahead of the bars.
+        """
+        data_path, meta_path = self._paths(ticker, interval)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        if not data.empty:
+            row_group = None if interval in DAILY_INTERVALS else INTRADAY_ROW_GROUP
+            data.to_parquet(data_path + '.tmp', row_group_size=row_group)
+            os.replace(data_path + '.tmp', data_path)
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'covered': [[s.strftime('%Y-%m-%d'), e.strftime('%Y-%m-%d')] for s, e in covered]}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    def _normalize(self, df, interval):
+        if df.empty:
+            return df
+        df = df.copy()
+        df.index = pd.DatetimeIndex(df.index)
+        if interval in DAILY_INTERVALS:
+            if df.index.tz is not None:
+                df.index = df.index.tz_localize(None)
+            df.index.name = 'Date'
+        else:
+            df.index = df.index.tz_localize('UTC') if df.index.tz is None else df.index.tz_convert('UTC')
+            df.index.name = 'Datetime'
+        return df
+
+    def ensure(self, ticker, start, end, interval='1d'):
+        """
+        Fetch and store whatever part of the whole-day range [start, end) is not
+        covered yet, in one rewrite of the ticker's file. Returns all stored bars
+        after the merge, or None when nothing was missing (nothing is read then).
+        """
+        return self.ensure_ranges(ticker, [(start, end)], interval)
+
+    def _gaps(self, ticker, ranges, interval):
+        covered = self._covered(ticker, interval)
+        gaps = []
+        for start, end in _merge_ranges([list(_day_bounds(s, e)) for s, e in ranges]):
+            gaps += _missing_ranges(covered, start, end)
+        return gaps
+
+    def ensure_ranges(self, ticker, ranges, interval='1d'):
+        """
+        ensure() for several whole-day ranges at once: every gap is fetched, then
+        one rewrite. The read-merge-write holds a lock on the ticker's file, so
+        parallel pipeline stages extending the same ticker don't lose each
+        other's bars or coverage.
+        """
+        if not self._gaps(ticker, ranges, interval):
+            return None
+        data_path, _ = self._paths(ticker, interval)
+        with _locked(data_path + '.lock'):
+            return self._fill(ticker, ranges, interval)
+
+    def _fill(self, ticker, ranges, interval):
+        # Gaps again under the lock: another process may have filled some meanwhile
+        gaps = self._gaps(ticker, ranges, interval)
+        if not gaps:
+            return None
+        data, covered = self._load(ticker, interval)
+        today = pd.Timestamp.now().normalize()
+        frames = [data] if not data.empty else []
+        added = False
+        for gap_start, gap_end in gaps:
+            with metrics.timer('price_fetch'):
+                fetched = self._normalize(self.fetcher(ticker, gap_start, gap_end, interval), interval)
+            self.fetches += 1
+            metrics.count('price_fetches')
+            metrics.count('price_bars_fetched', len(fetched))
+            if not fetched.empty:
+                frames.append(fetched)
+                added = True
+            else:
+                metrics.count('price_fetches_empty')
+            # Today's bars are still forming, so never mark them as complete
+            confirmed = _confirmed_range(fetched, gap_start, min(gap_end, today)) \
+                if gap_start < min(gap_end, today) else None
+            if confirmed is not None and confirmed[0] < confirmed[1]:
+                covered.append(confirmed)
+                added = True
+        if frames:
+            data = pd.concat(frames)
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+        if added:
+            self._save(ticker, interval, data, _merge_ranges(covered))
+        return data
+
+    def get_bars(self, ticker, start, end, interval='1d'):
+        """
+        Return bars for ticker in the whole-day range [start, end).
+        Daily bars have a naive date index, intraday bars a UTC index.
+        """
+        start, end = _day_bounds(start, end)
+        data = self.ensure(ticker, start, end, interval)
+        if data is None:
+            # Fully covered: only the row groups overlapping the range are read
+            data, _ = self._load(ticker, interval, start, end)
+        if data.empty:
+            return data
+        lo, hi = _index_bounds(data.index, start, end)
+        return data[(data.index >= lo) & (data.index < hi)]
+
+    def get_closes(self, tickers, start, end, interval='1d', field='Close'):
+        """Aligned dates x tickers frame of one price field."""
+        columns = {}
+        for ticker in tickers:
+            bars = self.get_bars(ticker, start, end, interval)
+            columns[ticker] = bars[field] if not bars.empty else pd.Series(dtype=float)
+        return pd.DataFrame(columns).sort_index()
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+import numpy as np
+from metrics import metrics
+
+DEFAULT_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'finbert_scores.sqlite')
+
+_whitespace = re.compile(r"\s+")
+
+
+def text_hash(text):
+    """Hash of the whitespace-normalized text, used as the cache key."""
+    norm = _whitespace.sub(' ', str(text)).strip()
+    return hashlib.sha1(norm.encode('utf-8')).hexdigest()
+
+
+class ScoreCache:
+    """
+    On-disk SQLite cache of bear/neut/bull scores keyed by (model id, text hash).
+    Least recently used rows are evicted once the cache holds more than max_entries.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE, max_entries=5_000_000):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS scores ('
+            ' model TEXT NOT NULL, hash TEXT NOT NULL,'
+            ' bear REAL, neut REAL, bull REAL, used REAL,'
+            ' PRIMARY KEY (model, hash))'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS scores_used ON scores (used)')
+
+    def get_many(self, model_id, hashes):
+        """Return {hash: (bear, neut, bull)} for the hashes already stored."""
+        found = {}
+        unique = list(dict.fromkeys(hashes))
+        # Stay under SQLite's host parameter limit
+        for start in range(0, len(unique), 500):
+            chunk = unique[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, bear, neut, bull FROM scores WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                [model_id, *chunk]
+            ).fetchall()
+            for h, bear, neut, bull in rows:
+                found[h] = (bear, neut, bull)
+        if found:
+            now = time.time()
+            self.conn.executemany(
+                'UPDATE scores SET used = ? WHERE model = ? AND hash = ?',
+                [(now, model_id, h) for h in found]
+            )
+            self.conn.commit()
+        return found
+
+    def put_many(self, model_id, hashes, scores):
+        now = time.time()
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO scores (model, hash, bear, neut, bull, used) VALUES (?, ?, ?, ?, ?, ?)',
+            [(model_id, h, float(s[0]), float(s[1]), float(s[2]), now) for h, s in zip(hashes, scores)]
+        )
+        self.conn.commit()
+        self.evict()
+
+    def evict(self):
+        """Drop the least recently used rows beyond max_entries."""
+        count = self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+        excess = count - self.max_entries
+        if excess > 0:
+            self.conn.execute(
+                'DELETE FROM scores WHERE rowid IN (SELECT rowid FROM scores ORDER BY used LIMIT ?)',
+                (excess,)
+            )
+            self.conn.commit()
+
+    def score(self, texts, scorer, model_id):
+        """
+        Return an (n, 3) score array for texts, calling scorer(list_of_texts)
+        only for texts whose hash is not cached yet.
+        """
+        texts = ['' if t is None or t != t else str(t) for t in texts]
+        hashes = [text_hash(t) for t in texts]
+        found = self.get_many(model_id, hashes)
+
+        # Score each unseen text once, even if it repeats in this batch
+        missing = {}
+        for h, t in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = t
+        # Stats count input rows, so a repeated uncached text is a miss each time
+        misses = sum(1 for h in hashes if h in missing)
+        self.hits += len(texts) - misses
+        self.misses += misses
+        metrics.count('cache_hits', len(texts) - misses)
+        metrics.count('cache_misses', misses)
+        if missing:
+            new_scores = scorer(list(missing.values()))
+            self.put_many(model_id, list(missing.keys()), new_scores)
+            for h, s in zip(missing.keys(), new_scores):
+                found[h] = tuple(s)
+
+        scores = np.zeros((len(texts), 3), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            scores[i] = found[h]
+        return scores
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = self.hits / total if total else 0.0
+        return f"cache hits={self.hits} misses={self.misses} hit_rate={rate:.1%}"
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,298 @@
+import argparse
+import collections
+import json
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+from sentiment import BACKENDS, MODEL_ID, cache_key, get_model, score_texts
+from metrics import metrics
+
+HOST = '127.0.0.1'
+PORT = 8765
+DEFAULT_URL = f'http://{HOST}:{PORT}'
+# Texts per HTTP request from the client; the server re-batches them anyway
+CLIENT_CHUNK = 2048
+
+
+def _bucket(n):
+    """Power-of-two histogram bucket label for n (1, 2, 3-4, 5-8, ...)."""
+    if n <= 2:
+        return str(n)
+    hi = 1 << (n - 1).bit_length()
+    return f'{hi // 2 + 1}-{hi}'
+
+
+class _Job:
+    """One request's texts, filled in batch by batch by the batcher thread."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.scores = np.zeros((len(texts), 3), dtype=np.float32)
+        self.taken = 0
+        self.left = len(texts)
+        self.error = None
+        self.done = threading.Event()
+        self.enqueued = None
+
+
+class MicroBatcher:
+    """
+    Collects texts from concurrent requests into batches for one model.
+    A batch is scored as soon as max_batch texts are waiting, or max_wait
+    seconds after the oldest waiting text arrived, whichever comes first.
+    Bulk requests larger than max_batch are split across batches; small ones
+    from different clients share a batch.
+    """
+
+    def __init__(self, scorer, max_batch=64, max_wait=0.01):
+        self.scorer = scorer
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.pending = collections.deque()
+        self.waiting = 0
+        self.cond = threading.Condition()
+        self.batch_sizes = collections.Counter()
+        self.queue_depths = collections.Counter()
+        self.requests = 0
+        self.texts = 0
+        self.started = time.time()
+        self.thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self.thread.start()
+
+    def score(self, texts):
+        """Block until every text is scored; returns an (n, 3) array in input order."""
+        job = _Job(['' if t is None else str(t) for t in texts])
+        if not job.texts:
+            return job.scores
+        with self.cond:
+            job.enqueued = time.monotonic()
+            self.pending.append(job)
+            self.waiting += len(job.texts)
+            self.requests += 1
+            self.texts += len(job.texts)
+            self.cond.notify()
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.scores
+
+    def _next_batch(self):
+        """Wait for a full batch or the oldest text's deadline, then take up to max_batch texts."""
+        with self.cond:
+            while not self.pending:
+                self.cond.wait()
+            # The oldest pending job may have waited through the previous batch already
+            deadline = self.pending[0].enqueued + self.max_wait
+            while self.waiting < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            self.queue_depths[_bucket(self.waiting)] += 1
+            parts = []
+            size = 0
+            while self.pending and size < self.max_batch:
+                job = self.pending[0]
+                n = min(len(job.texts) - job.taken, self.max_batch - size)
+                parts.append((job, job.taken, job.taken + n))
+                job.taken += n
+                size += n
+                if job.taken == len(job.texts):
+                    self.pending.popleft()
+            self.waiting -= size
+            return parts, size
+
+    def _run(self):
+        while True:
+            parts, size = self._next_batch()
+            self.batch_sizes[_bucket(size)] += 1
+            texts = [t for job, lo, hi in parts for t in job.texts[lo:hi]]
+            try:
+                with metrics.timer('server_batch', items=size):
+                    scores = self.scorer(texts)
+            except Exception as e:
+                scores, error = None, e
+            else:
+                error = None
+            offset = 0
+            for job, lo, hi in parts:
+                if error is not None:
+                    job.error = error
+                else:
+                    job.scores[lo:hi] = scores[offset:offset + hi - lo]
+                offset += hi - lo
+                job.left -= hi - lo
+                if job.left == 0 or error is not None:
+                    job.done.set()
+
+    def stats(self):
+        batches = sum(self.batch_sizes.values())
+        return {'requests': self.requests, 'texts': self.texts, 'batches': batches,
+                'mean_batch': self.texts / batches if batches else 0.0, 'queue_depth': self.waiting,
+                'max_batch': self.max_batch, 'max_wait_ms': self.max_wait * 1000,
+                'batch_size_hist': dict(self.batch_sizes), 'queue_depth_hist': dict(self.queue_depths),
+                'uptime_s': time.time() - self.started}
+
+
+def make_handler(batcher, model_key):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, {'model': model_key})
+            elif self.path == '/stats':
+                self._reply(200, {'model': model_key, **batcher.stats()})
+            else:
+                self._reply(404, {'error': f'unknown path {self.path}'})
+
+        def do_POST(self):
+            if self.path != '/score':
+                return self._reply(404, {'error': f'unknown path {self.path}'})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                single = 'text' in body
+                texts = [body['text']] if single else body['texts']
+            except (ValueError, KeyError, TypeError):
+                return self._reply(400, {'error': 'expected {"text": str} or {"texts": [str, ...]}'})
+            try:
+                scores = batcher.score(texts)
+            except Exception as e:
+                return self._reply(500, {'error': repr(e)})
+            self._reply(200, {'scores': scores[0].tolist() if single else scores.tolist()})
+
+        # Keep the console for the periodic stats line
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def serve(host=HOST, port=PORT, backend='torch-fp32', model_id=MODEL_ID, max_batch=64, max_wait=0.01,
+          stats_every=60):
+    """Load the model once, warm it up and serve /score, /stats and /health until interrupted."""
+    tokenizer, model = get_model(model_id, backend)
+    scorer = lambda texts: score_texts(texts, tokenizer, model, batch_size=max_batch)
+    scorer(['Warm-up text for the first batch.'])
+    batcher = MicroBatcher(scorer, max_batch, max_wait)
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, cache_key(model_id, backend)))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving {cache_key(model_id, backend)} on http://{host}:{port} "
+          f"(max batch {max_batch}, max wait {max_wait * 1000:.0f}ms)")
+    try:
+        while True:
+            time.sleep(stats_every)
+            s = batcher.stats()
+            print(f"requests={s['requests']} texts={s['texts']} batches={s['batches']} "
+                  f"mean_batch={s['mean_batch']:.1f} queue_depth={s['queue_depth']}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+
+
+class ScoreClient:
+    """Client for a running score server; score() has the same contract as sentiment.score_texts."""
+
+    def __init__(self, url=DEFAULT_URL, timeout=600):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, path, body=None, timeout=None):
+        data = None if body is None else json.dumps(body).encode('utf-8')
+        req = urllib.request.Request(self.url + path, data=data, headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=timeout or self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def model(self, timeout=1):
+        """Model key the server scores with, or None when no server answers."""
+        try:
+            return self._request('/health', timeout=timeout)['model']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def stats(self):
+        return self._request('/stats')
+
+    def score(self, texts, cache=None, model_id=None):
+        """(n, 3) bear/neut/bull scores; with a ScoreCache only unseen texts are sent."""
+        if cache is not None:
+            return cache.score(texts, self.score, model_id)
+        texts = ['' if t is None or t != t else str(t) for t in texts]
+        scores = np.zeros((len(texts), 3), dtype=np.float32)
+        for start in range(0, len(texts), CLIENT_CHUNK):
+            chunk = texts[start:start + CLIENT_CHUNK]
+            with metrics.timer('server_request', items=len(chunk)):
+                scores[start:start + len(chunk)] = self._request('/score', {'texts': chunk})['scores']
+        metrics.count('texts_scored_remote', len(texts))
+        return scores
+
+
+def connect(url=DEFAULT_URL, model_key=MODEL_ID):
+    """A client when a server for model_key is running at url, otherwise None."""
+    client = ScoreClient(url)
+    served = client.model()
+    if served is None:
+        return None
+    if served != model_key:
+        print(f"Score server at {url} serves {served}, not {model_key}; scoring locally")
+        return None
+    print(f"Scoring with the server at {url}")
+    return client
+
+
+def score_with(client, texts, backend='torch-fp32', batch_size=32, cache=None, workers=1):
+    """
+    Score texts on the server when a client is given, falling back to a local
+    model if it is unreachable or fails; scores are cached the same either way.
+    The local model is only loaded once some text is not already cached.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.zeros((0, 3), dtype=np.float32)
+    model_key = cache_key(backend=backend)
+    if client is not None:
+        try:
+            return client.score(texts, cache=cache, model_id=model_key)
+        except (OSError, ValueError) as e:
+            print(f"Score server failed ({e}); scoring locally")
+
+    def score_locally(missing):
+        tokenizer, model = get_model(backend=backend)
+        return score_texts(missing, tokenizer, model, batch_size=batch_size, workers=workers)
+
+    if cache is not None:
+        return cache.score(texts, score_locally, model_key)
+    return score_locally(texts)
+
+
+def add_arguments(parser):
+    parser.add_argument('--server', default=DEFAULT_URL,
+                        help='Score on this running score server when available (see score_server.py)')
+    parser.add_argument('--no-server', action='store_true', help='Always load a local model')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve FinBERT scores from one warm model with dynamic micro-batching')
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--backend', choices=BACKENDS, default='torch-fp32', help='FinBERT inference backend')
+    parser.add_argument('--max-batch', type=int, default=64, help='Texts per model call')
+    parser.add_argument('--max-wait-ms', type=float, default=10, help='Longest wait to fill a batch')
+    parser.add_argument('--stats-every', type=float, default=60, help='Seconds between stats lines')
+    parser.add_argument('--stats', action='store_true', help="Print a running server's stats and exit")
+    args = parser.parse_args()
+    if args.stats:
+        print(json.dumps(ScoreClient(f'http://{args.host}:{args.port}').stats(), indent=2))
+    else:
+        serve(args.host, args.port, args.backend, max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+              stats_every=args.stats_every)
@@ -0,0 +1,245 @@
+import argparse
+import atexit
+import functools
+import os
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+from metrics import metrics
+
+# torch and transformers are imported inside the functions that need them, so
+# importing this module (or the scripts built on it) stays fast
+
+MODEL_ID = 'yiyanghkust/finbert-tone'
+BACKENDS = ('torch-fp32', 'torch-dynamic-int8', 'onnxruntime')
+MODEL_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'models')
+
+# Tokenizer and model held by each worker process
+_worker = None
+# Parent-side ((tokenizer id, model id, workers), pool), kept open across calls
+_pool = None
+
+
+class OnnxModel:
+    """ONNX Runtime session called like the torch model: model(**batch).logits."""
+
+    def __init__(self, path):
+        import onnxruntime as ort
+        self.path = path
+        self.session = ort.InferenceSession(path, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def __call__(self, **batch):
+        import torch
+        feeds = {k: v.numpy() for k, v in batch.items() if k in self.input_names}
+        logits = self.session.run(['logits'], feeds)[0]
+        return SimpleNamespace(logits=torch.from_numpy(logits))
+
+    # Sessions are not picklable, so spawned workers reopen the file
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+
+def _cached_path(model_id, suffix):
+    os.makedirs(MODEL_CACHE, exist_ok=True)
+    return os.path.join(MODEL_CACHE, model_id.replace('/', '--') + suffix)
+
+
+def export_onnx(model_id, path):
+    """Export the classifier to ONNX with dynamic batch and sequence axes."""
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModelForSequenceClassification.from_pretrained(model_id)
+    model.eval()
+    model.config.return_dict = False
+    sample = dict(tokenizer(['Tesla shares rallied after the delivery report.'], return_tensors='pt'))
+    names = list(sample.keys())
+    axes = {name: {0: 'batch', 1: 'sequence'} for name in names}
+    axes['logits'] = {0: 'batch'}
+    torch.onnx.export(model, (sample,), path, input_names=names, output_names=['logits'],
+                      dynamic_axes=axes, opset_version=14)
+
+
+def load_model(model_id=MODEL_ID, backend='torch-fp32'):
+    """
+    Load the FinBERT tokenizer and model for an inference backend.
+    Converted models (int8 weights, ONNX graph) are built once and cached under cache/models.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    import torch
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    if backend == 'onnxruntime':
+        path = _cached_path(model_id, '.onnx')
+        if not os.path.exists(path):
+            export_onnx(model_id, path)
+        return tokenizer, OnnxModel(path)
+    if backend == 'torch-dynamic-int8':
+        path = _cached_path(model_id, '-int8.pt')
+        if os.path.exists(path):
+            model = torch.load(path, weights_only=False)
+        else:
+            model = AutoModelForSequenceClassification.from_pretrained(model_id)
+            model.eval()
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            torch.save(model, path)
+        model.eval()
+        return tokenizer, model
+    model = AutoModelForSequenceClassification.from_pretrained(model_id)
+    model.eval()
+    return tokenizer, model
+
+
+@functools.lru_cache(maxsize=None)
+def get_model(model_id=MODEL_ID, backend='torch-fp32'):
+    """Load a model on first use and reuse it afterwards."""
+    return load_model(model_id, backend)
+
+
+def cache_key(model_id=MODEL_ID, backend='torch-fp32'):
+    """Score-cache key; converted backends get their own entries since their scores differ slightly."""
+    return model_id if backend == 'torch-fp32' else f'{model_id}:{backend}'
+
+
+def score_texts(texts, tokenizer, model, batch_size=32, cache=None, model_id=MODEL_ID, workers=1):
+    """
+    Score texts in mini-batches and return an (n, 3) float array of
+    bear/neut/bull probabilities in input order.
+    Texts are sorted by token length so each batch pads to a similar size.
+    With a ScoreCache, only texts not seen before are sent to the model.
+    With workers > 1, texts are sharded across a process pool.
+    """
+    if cache is not None:
+        return cache.score(
+            texts, lambda missing: score_texts(missing, tokenizer, model, batch_size, workers=workers), model_id
+        )
+    if workers > 1:
+        return _score_parallel(list(texts), tokenizer, model, batch_size, workers)
+    import torch
+    texts = ['' if t is None or t != t else str(t) for t in texts]
+    scores = np.zeros((len(texts), 3), dtype=np.float32)
+    if not texts:
+        return scores
+
+    # Tokenize once without padding to get lengths, then bucket by length
+    with metrics.timer('tokenize', items=len(texts)):
+        encoded = tokenizer(texts, truncation=True)
+    lengths = np.fromiter((len(ids) for ids in encoded['input_ids']), dtype=np.int64, count=len(texts))
+    order = np.argsort(lengths, kind='stable')
+    metrics.count('texts_tokenized', len(texts))
+    metrics.count('tokens', int(lengths.sum()))
+
+    with torch.inference_mode():
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            # Latency per batch; items are the batch's real (unpadded) tokens
+            with metrics.timer('score_batch', items=int(lengths[idx].sum())):
+                batch = tokenizer.pad(
+                    {key: [encoded[key][i] for i in idx] for key in encoded.keys()},
+                    return_tensors='pt'
+                )
+                logits = model(**batch).logits
+                scores[idx] = torch.softmax(logits, dim=1).numpy()
+    metrics.count('texts_scored', len(texts))
+    return scores
+
+
+def _init_worker(tokenizer, model, threads):
+    global _worker
+    import torch
+    # Split the cores between workers instead of letting each one use all of them
+    torch.set_num_threads(threads)
+    _worker = (tokenizer, model)
+
+
+def _score_shard(args):
+    texts, batch_size = args
+    tokenizer, model = _worker
+    return score_texts(texts, tokenizer, model, batch_size)
+
+
+def _get_pool(tokenizer, model, workers):
+    """
+    Process pool holding tokenizer and model, created on first use and reused
+    by later calls (e.g. every chunk of a streaming run) so the workers only
+    receive the weights once. With fork, workers inherit the parent's weights
+    copy-on-write; otherwise the weights are moved to shared memory first.
+    """
+    global _pool
+    key = (id(tokenizer), id(model), workers)
+    if _pool is not None and _pool[0] == key:
+        return _pool[1]
+    close_pool()
+    import torch
+    import torch.multiprocessing as mp
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # Forked tokenizers deadlock if their own thread pool was already used
+    os.environ['TOKENIZERS_PARALLELISM'] = 'false'
+    method = 'fork' if 'fork' in mp.get_all_start_methods() else 'spawn'
+    if method != 'fork' and isinstance(model, torch.nn.Module):
+        model.share_memory()
+    pool = mp.get_context(method).Pool(workers, initializer=_init_worker, initargs=(tokenizer, model, threads))
+    _pool = (key, pool)
+    return pool
+
+
+def close_pool():
+    """Shut down the scoring pool, if one was started."""
+    global _pool
+    if _pool is not None:
+        _pool[1].close()
+        _pool[1].join()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
+def _score_parallel(texts, tokenizer, model, batch_size, workers):
+    """Score shards of texts on the shared process pool and merge them in input order."""
+    if len(texts) < 2 * batch_size:
+        return score_texts(texts, tokenizer, model, batch_size)
+    # A few shards per worker keeps the pool busy when text lengths are uneven
+    shard_size = max(batch_size, -(-len(texts) // (workers * 4)))
+    shards = [(texts[i:i + shard_size], batch_size) for i in range(0, len(texts), shard_size)]
+
+    # Worker-side counters stay in the workers, so the parent records the totals
+    with metrics.timer('score_parallel', items=len(texts)):
+        parts = _get_pool(tokenizer, model, workers).map(_score_shard, shards)
+    metrics.count('texts_scored', len(texts))
+    return np.concatenate(parts)
+
+
+def check_backend(backend, sample_csv='pilot_study/annotate_joe.csv', text_col='text', model_id=MODEL_ID):
+    """
+    Compare a backend's bear/neut/bull scores with torch-fp32 on a held-out sample.
+    Returns the number of texts whose top label changed.
+    """
+    texts = pd.read_csv(sample_csv)[text_col].fillna('').astype(str).tolist()
+    reference = score_texts(texts, *get_model(model_id, 'torch-fp32'))
+    candidate = score_texts(texts, *get_model(model_id, backend))
+    diff = np.abs(candidate - reference)
+    flipped = np.flatnonzero(candidate.argmax(axis=1) != reference.argmax(axis=1))
+    print(f"{backend} vs torch-fp32 on {len(texts)} texts from {sample_csv}")
+    print(f"  max abs score diff:  {diff.max():.5f}")
+    print(f"  mean abs score diff: {diff.mean():.5f}")
+    print(f"  label agreement:     {1 - len(flipped) / max(len(texts), 1):.2%} ({len(flipped)} flipped)")
+    for i in flipped[:10]:
+        print(f"  flipped #{i}: fp32={np.round(reference[i], 3)} {backend}={np.round(candidate[i], 3)}")
+    return len(flipped)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check an inference backend against fp32 FinBERT scores')
+    parser.add_argument('--check-backend', choices=BACKENDS[1:], required=True)
+    parser.add_argument('--sample', default='pilot_study/annotate_joe.csv')
+    parser.add_argument('--text-col', default='text')
+    parser.add_argument('--max-flips', type=int, default=0, help='Exit non-zero above this many label changes')
+    args = parser.parse_args()
+    flips = check_backend(args.check_backend, args.sample, args.text_col)
+    raise SystemExit(1 if flips > args.max_flips else 0)
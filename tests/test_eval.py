@@ -0,0 +1,35 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'pilot_study')]
+from eval import label_moves
+
+
+def _tweets():
+    return pd.DataFrame({'date': ['2024-03-04 15:00:00+00:00', '2024-03-05 15:00:00+00:00'],
+                         'matched_tickers': ['AAPL,GOOGL', 'AMZN']})
+
+
+def _closes(tickers):
+    dates = pd.bdate_range('2024-02-26', '2024-03-15')
+    return pd.DataFrame({t: np.linspace(100, 110, len(dates)) for t in tickers}, index=dates)
+
+
+def test_label_moves_without_any_prices():
+    # Offline, or every fetch failed: only unrelated bars are available
+    for closes in [pd.DataFrame(), _closes(['TSLA', 'SPY'])]:
+        out = label_moves(_tweets(), closes)
+        assert list(out.columns) == ['price_ret', 'price_move', 'price_moves']
+        assert out['price_ret'].isna().all()
+        assert out['price_move'].isna().all()
+        assert out['price_moves'].isna().all()
+
+
+def test_label_moves_per_ticker_labels():
+    out = label_moves(_tweets(), _closes(['AAPL', 'GOOGL']), window_days=3, threshold=0.01)
+    assert out.loc[0, 'price_move'] == 'up'
+    assert out.loc[0, 'price_moves'] == 'AAPL:up,GOOGL:up'
+    assert pd.isna(out.loc[1, 'price_ret'])
@@ -0,0 +1,96 @@
+import argparse
+import ast
+import re
+import time
+import pandas as pd
+
+
+def load_terms(stocks_csv):
+    """Map each lowercased company/product term to the tickers it refers to."""
+    stocks = pd.read_csv(stocks_csv)
+    terms = {}
+    for _, row in stocks.iterrows():
+        try:
+            products = ast.literal_eval(row['Context']) if isinstance(row.get('Context'), str) else []
+        except (ValueError, SyntaxError):
+            products = []
+        for term in [row['Company']] + list(products or []):
+            tickers = terms.setdefault(term.lower(), [])
+            if row['Ticker'] not in tickers:
+                tickers.append(row['Ticker'])
+    return terms
+
+
+class TickerMatcher:
+    """
+    Finds every S&P 100 company or product mention in one regex pass.
+    All terms are compiled into a single word-bounded alternation (longest
+    first), and each match is mapped back to its tickers.
+    """
+
+    def __init__(self, terms):
+        self.terms = terms
+        alternation = '|'.join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+        self.pattern = re.compile(r"\b(?:" + alternation + r")\b", re.IGNORECASE)
+
+    @classmethod
+    def from_csv(cls, stocks_csv):
+        return cls(load_terms(stocks_csv))
+
+    def find(self, text):
+        """List of (ticker, start, end) for every mention in text."""
+        if not isinstance(text, str):
+            return []
+        found = []
+        for m in self.pattern.finditer(text):
+            for ticker in self.terms.get(m.group(0).lower(), []):
+                found.append((ticker, m.start(), m.end()))
+        return found
+
+    def tickers(self, text):
+        """Sorted unique tickers mentioned in text."""
+        return sorted({ticker for ticker, _, _ in self.find(text)})
+
+    def match_column(self, texts):
+        """Comma-joined matched tickers for a whole text column ('' where nothing matched)."""
+        hits = pd.Series(texts).fillna('').astype(str).str.findall(self.pattern)
+        terms = self.terms
+        return hits.map(
+            lambda words: ','.join(sorted({t for w in words for t in terms.get(w.lower(), [])}))
+        )
+
+
+def benchmark(stocks_csv, input_csv, text_col='text', repeat=3):
+    """Compare the per-ticker pattern loop with the single-pass matcher on a text column."""
+    from general_annotate import load_stock_patterns
+
+    texts = pd.read_csv(input_csv)[text_col].fillna('').astype(str).tolist()
+    patterns = load_stock_patterns(stocks_csv)
+    matcher = TickerMatcher.from_csv(stocks_csv)
+
+    def loop():
+        return [','.join(sorted(t for t, pat in patterns if pat.search(x))) for x in texts]
+
+    def single_pass():
+        return matcher.match_column(texts).tolist()
+
+    for name, fn in [('pattern loop', loop), ('single pass', single_pass)]:
+        best = min(_timed(fn) for _ in range(repeat))
+        print(f"{name:>12}: {best:.3f}s for {len(texts)} texts ({len(texts) / best:,.0f} texts/s)")
+    mismatched = sum(a != b for a, b in zip(loop(), single_pass()))
+    print(f"Rows where the two matchers disagree: {mismatched}")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark single-pass ticker matching')
+    parser.add_argument('--stocks', default='sp100_context.csv')
+    parser.add_argument('--input', default='annotate_congress.csv')
+    parser.add_argument('--text-col', default='text')
+    args = parser.parse_args()
+    benchmark(args.stocks, args.input, args.text_col)
@@ -0,0 +1,133 @@
+import functools
+import numpy as np
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+
+EXCHANGE_TZ = 'America/New_York'
+OPEN_TIME = pd.Timedelta(hours=9, minutes=30)
+CLOSE_TIME = pd.Timedelta(hours=16)
+EARLY_CLOSE_TIME = pd.Timedelta(hours=13)
+
+# Unscheduled closures (national days of mourning, 9/11, Hurricane Sandy)
+SPECIAL_CLOSURES = [
+    '2001-09-11', '2001-09-12', '2001-09-13', '2001-09-14', '2004-06-11', '2007-01-02',
+    '2012-10-29', '2012-10-30', '2018-12-05', '2025-01-09',
+]
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    # New Year's Day falling on a Saturday is not observed on the Friday before
+    rules = [
+        Holiday('New Years Day', month=1, day=1, observance=sunday_to_monday),
+        Holiday('Martin Luther King Jr. Day', month=1, day=1, offset=USMartinLutherKingJr.offset,
+                start_date='1998-01-01'),
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+def _early_closes(sessions):
+    """1pm closes: July 3rd, the day after Thanksgiving and Christmas Eve, when they are sessions."""
+    s = pd.DatetimeIndex(sessions)
+    july3 = (s.month == 7) & (s.day == 3)
+    black_friday = (s.month == 11) & (s.weekday == 4) & (s.day >= 23) & (s.day <= 29)
+    xmas_eve = (s.month == 12) & (s.day == 24)
+    return july3 | black_friday | xmas_eve
+
+
+class TradingCalendar:
+    """
+    NYSE sessions between start and end with their open and close instants.
+    Tweets are aligned to the session they can first affect: the same session
+    when posted before its close, otherwise the next one, so weekend, holiday
+    and after-hours tweets roll forward. Everything after construction is a
+    searchsorted or an integer offset into the session arrays.
+    """
+
+    def __init__(self, start='1995-01-01', end='2035-12-31'):
+        holidays = NYSEHolidayCalendar().holidays(start, end)
+        days = pd.bdate_range(start, end).as_unit('ns')
+        days = days[~days.isin(holidays) & ~days.isin(pd.DatetimeIndex(SPECIAL_CLOSURES))]
+        self.sessions = days
+        self.early_close = _early_closes(days)
+        close = np.where(self.early_close, EARLY_CLOSE_TIME.value, CLOSE_TIME.value)
+        # Wall-clock open/close times are added to the local date before converting to UTC
+        self.opens = (days + OPEN_TIME).as_unit('ns').tz_localize(EXCHANGE_TZ).tz_convert('UTC')
+        self.closes = (pd.DatetimeIndex((days.asi8 + close).astype('datetime64[ns]'))
+                       .tz_localize(EXCHANGE_TZ).tz_convert('UTC'))
+        self._closes_ns = self.closes.asi8
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def event_sessions(self, timestamps):
+        """
+        Session position for each timestamp: the first session whose close is
+        after it. Naive timestamps are taken as UTC; unparseable ones give -1.
+        """
+        ts = pd.DatetimeIndex(pd.to_datetime(timestamps, utc=True, errors='coerce', format='mixed')).as_unit('ns')
+        pos = np.searchsorted(self._closes_ns, ts.asi8, side='right').astype(np.int64)
+        pos[ts.isna() | (pos >= len(self.sessions))] = -1
+        return pos
+
+    def event_days(self, timestamps):
+        """Effective event trading day (naive session date) for each timestamp."""
+        return self.session_dates(self.event_sessions(timestamps))
+
+    def session_dates(self, positions):
+        """Session dates for positions; out-of-range positions give NaT."""
+        positions = np.asarray(positions, dtype=np.int64)
+        ok = (positions >= 0) & (positions < len(self.sessions))
+        out = np.full(len(positions), np.datetime64('NaT'), dtype='datetime64[ns]')
+        out[ok] = self.sessions.values[positions[ok]]
+        return pd.DatetimeIndex(out)
+
+    def session_positions(self, dates):
+        """Position of each date among the sessions, -1 where the date is not a session."""
+        days = pd.DatetimeIndex(dates)
+        if days.tz is not None:
+            days = days.tz_convert(EXCHANGE_TZ).tz_localize(None)
+        days = days.normalize().as_unit('ns')
+        pos = self.sessions.searchsorted(days, side='left')
+        found = pos < len(self.sessions)
+        found[found] = self.sessions.values[pos[found]] == days.values[found]
+        return np.where(found, pos, -1).astype(np.int64)
+
+    def offset(self, positions, k):
+        """Session positions shifted by k trading days (-1 when outside the calendar)."""
+        shifted = np.asarray(positions, dtype=np.int64) + k
+        return np.where((np.asarray(positions) >= 0) & (shifted >= 0) & (shifted < len(self.sessions)),
+                        shifted, -1)
+
+    def window(self, positions, window):
+        """(first, last) session dates of an inclusive trading-day window around each event."""
+        return (self.session_dates(self.offset(positions, window[0])),
+                self.session_dates(self.offset(positions, window[1])))
+
+    def sessions_between(self, start, end):
+        """Sessions in [start, end]."""
+        return self.sessions[(self.sessions >= pd.Timestamp(start)) & (self.sessions <= pd.Timestamp(end))]
+
+    def is_session(self, dates):
+        return self.session_positions(dates) >= 0
+
+    def session_open(self, positions):
+        return self.opens[np.asarray(positions, dtype=np.int64)]
+
+    def session_close(self, positions):
+        return self.closes[np.asarray(positions, dtype=np.int64)]
+
+
+@functools.lru_cache(maxsize=None)
+def get_calendar(start='1995-01-01', end='2035-12-31'):
+    """Shared calendar instance, built once per process."""
+    return TradingCalendar(start, end)
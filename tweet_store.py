@@ -0,0 +1,178 @@
+import argparse
+import os
+import shutil
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+DEFAULT_STORE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'tweets')
+
+# Per-source defaults: candidate timestamp columns, the user column (or a fixed user)
+SOURCES = {
+    'musk': {'date_cols': ['createdAt'], 'user_col': None, 'user': 'elonmusk'},
+    'congress': {'date_cols': ['date', 'timestamp', 'time', 'created_at'], 'user_col': 'screen_name'},
+    'stockerbot': {'date_cols': ['timestamp', 'created_at'], 'user_col': 'source'},
+}
+
+# Columns added by ingest on top of the raw ones
+STORE_COLS = ['ts', 'user', 'year', 'month']
+CATEGORICAL_COLS = ['user', 'screen_name', 'source', 'lang']
+
+
+# Declared Parquet type of each column kind found by _column_kinds
+ARROW_TYPES = {'int': pa.int64(), 'float': pa.float32(), 'bool': pa.bool_(), 'string': pa.string()}
+STORE_TYPES = {'ts': pa.timestamp('ns', tz='UTC'), 'user': pa.string(), 'year': pa.int16(), 'month': pa.int8()}
+INT_PATTERN = r'[+-]?\d+(\.0*)?'
+
+
+def _column_kinds(csv_path, chunksize):
+    """
+    Kind of every column over the whole file, read as text so ids never pass
+    through float64: 'bool' for True/False, 'int' for integers (ids and
+    counts), 'float', or 'string' for anything else and all-empty columns.
+    """
+    candidates, seen = {}, set()
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, dtype=str):
+        for col in chunk.columns:
+            left = candidates.setdefault(col, {'bool', 'int', 'float'})
+            values = chunk[col].dropna()
+            if values.empty or not left:
+                continue
+            seen.add(col)
+            if 'bool' in left and not values.isin(['True', 'False']).all():
+                left.discard('bool')
+            if 'int' in left and not values.str.fullmatch(INT_PATTERN).all():
+                left.discard('int')
+            if 'float' in left and pd.to_numeric(values, errors='coerce').isna().any():
+                left.discard('float')
+    kinds = {}
+    for col, left in candidates.items():
+        kinds[col] = next((k for k in ('bool', 'int', 'float') if k in left and col in seen), 'string')
+    return kinds
+
+
+def _compact(chunk, kinds):
+    """Cast a text chunk to its declared kinds: nullable int64 ids and counts, float32, booleans."""
+    for col, kind in kinds.items():
+        values = chunk[col]
+        if kind == 'int':
+            chunk[col] = values.str.replace(r'\.0*$', '', regex=True).astype('Int64')
+        elif kind == 'float':
+            chunk[col] = pd.to_numeric(values).astype('float32')
+        elif kind == 'bool':
+            chunk[col] = values.map({'True': True, 'False': False}).astype('boolean')
+    return chunk
+
+
+def ingest(csv_path, source, root=DEFAULT_STORE, date_col=None, user_col=None, chunksize=200_000):
+    """
+    Write a raw tweet CSV into <root>/source=<source>/year=YYYY/month=M Parquet partitions.
+    Adds a UTC 'ts' column, a 'user' column and the partition keys; the original columns are kept.
+    Re-ingesting a source replaces it.
+    """
+    spec = SOURCES.get(source, {})
+    target = os.path.join(root, f'source={source}')
+    if os.path.exists(target):
+        shutil.rmtree(target)
+
+    # One schema declared from a first pass over the whole file, so every chunk writes the same types
+    kinds = _column_kinds(csv_path, chunksize)
+    schema = pa.schema([pa.field(c, ARROW_TYPES[k]) for c, k in kinds.items() if c not in STORE_TYPES] +
+                       [pa.field(c, t) for c, t in STORE_TYPES.items()])
+    rows = 0
+    for n, chunk in enumerate(pd.read_csv(csv_path, chunksize=chunksize, dtype=str)):
+        date_col = date_col or next(c for c in spec.get('date_cols', []) + ['createdAt', 'date', 'timestamp']
+                                    if c in chunk.columns)
+        user_col = user_col or spec.get('user_col')
+        chunk = _compact(chunk, kinds)
+        chunk['ts'] = pd.to_datetime(chunk[date_col], utc=True, errors='coerce', format='mixed')
+        chunk = chunk[chunk['ts'].notna()]
+        chunk['user'] = chunk[user_col].astype(str) if user_col in chunk.columns else spec.get('user', source)
+        chunk['year'] = chunk['ts'].dt.year.astype('int16')
+        chunk['month'] = chunk['ts'].dt.month.astype('int8')
+
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        pq.write_to_dataset(table, root_path=target, partition_cols=['year', 'month'],
+                            basename_template=f'part-{n}-{{i}}.parquet')
+        rows += len(chunk)
+    print(f"Ingested {rows} tweets from {csv_path} into {target}")
+    return rows
+
+
+def has_source(source, root=DEFAULT_STORE):
+    return os.path.isdir(os.path.join(root, f'source={source}'))
+
+
+def read_tweets(source, start=None, end=None, users=None, columns=None, root=DEFAULT_STORE):
+    """
+    Tweets of one source with ts in [start, end), optionally limited to some users and columns.
+    Only the year/month partitions overlapping the range are opened.
+    """
+    dataset = ds.dataset(os.path.join(root, f'source={source}'), format='parquet', partitioning='hive')
+    year, month = ds.field('year'), ds.field('month')
+    conditions = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        start = start.tz_localize('UTC') if start.tz is None else start.tz_convert('UTC')
+        conditions += [(year > start.year) | ((year == start.year) & (month >= start.month)),
+                       ds.field('ts') >= start]
+    if end is not None:
+        end = pd.Timestamp(end)
+        end = end.tz_localize('UTC') if end.tz is None else end.tz_convert('UTC')
+        conditions += [(year < end.year) | ((year == end.year) & (month <= end.month)),
+                       ds.field('ts') < end]
+    if users:
+        conditions.append(ds.field('user').isin(list(users)))
+    condition = None
+    for c in conditions:
+        condition = c if condition is None else condition & c
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name not in ('year', 'month')]
+    table = dataset.to_table(columns=list(columns), filter=condition)
+    df = table.to_pandas()
+    for col in CATEGORICAL_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    return df.sort_values('ts').reset_index(drop=True) if 'ts' in df.columns else df
+
+
+def load_tweets(spec, **read_csv_kwargs):
+    """
+    Load tweets from a CSV path or from the store with 'store:<source>[:<start>[:<end>]]'.
+    Store reads drop the added columns so the frame looks like the raw CSV.
+    """
+    if not spec.startswith('store:'):
+        return pd.read_csv(spec, **read_csv_kwargs)
+    parts = spec.split(':')
+    source = parts[1]
+    start = parts[2] if len(parts) > 2 and parts[2] else None
+    end = parts[3] if len(parts) > 3 and parts[3] else None
+    df = read_tweets(source, start, end)
+    return df.drop(columns=[c for c in STORE_COLS if c in df.columns])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Partitioned Parquet store for raw tweet dumps')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_ingest = sub.add_parser('ingest', help='Write a raw tweet CSV into the store')
+    p_ingest.add_argument('csv')
+    p_ingest.add_argument('--source', required=True, help=f"Source name, e.g. {', '.join(SOURCES)}")
+    p_ingest.add_argument('--date-col')
+    p_ingest.add_argument('--user-col')
+    p_query = sub.add_parser('query', help='Export a slice of the store to CSV')
+    p_query.add_argument('--source', required=True)
+    p_query.add_argument('--start')
+    p_query.add_argument('--end', help='Exclusive end date')
+    p_query.add_argument('--users', nargs='*')
+    p_query.add_argument('--out', required=True)
+    parser.add_argument('--root', default=DEFAULT_STORE)
+    args = parser.parse_args()
+
+    if args.command == 'ingest':
+        ingest(args.csv, args.source, args.root, args.date_col, args.user_col)
+    else:
+        df = read_tweets(args.source, args.start, args.end, args.users, root=args.root)
+        df.drop(columns=['ts', 'user']).to_csv(args.out, index=False)
+        print(f"Wrote {len(df)} tweets to {args.out}")